@@ -0,0 +1,219 @@
+"""
+TensorFlow-free runtime for the feedback ANN.
+The Keras model is a small MLP (Dense -> Dropout -> BatchNorm -> Dense), so
+its weights are exported once to an .npz file and served with a plain
+NumPy forward pass. Only the export/check commands need TensorFlow.
+
+    python ann_runtime.py export classificationd_model.keras feedback_ann.npz
+    python ann_runtime.py check classificationd_model.keras feedback_ann.npz
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+ACTIVATIONS = {
+    "linear": lambda z: z,
+    "relu": lambda z: np.maximum(z, 0.0),
+    "sigmoid": lambda z: 1.0 / (1.0 + np.exp(-z)),
+    "tanh": np.tanh,
+}
+
+
+def softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+ACTIVATIONS["softmax"] = softmax
+
+
+class NumpyMLP:
+    """
+    Inference-only stack of dense and affine (folded BatchNorm) layers.
+    `predict` mirrors keras.Model.predict so it can replace models["ANN"].
+    """
+
+    def __init__(self, layers):
+        self.layers = self._fold(layers)
+
+    @staticmethod
+    def _fold(layers):
+        """Fold an affine layer into the dense layer right after it."""
+        folded = []
+        for layer in layers:
+            previous = folded[-1] if folded else None
+            if (
+                layer["type"] == "dense"
+                and previous is not None
+                and previous["type"] == "affine"
+            ):
+                scale, shift = folded.pop()["params"]
+                kernel, bias = layer["params"]
+                layer = {
+                    "type": "dense",
+                    "activation": layer["activation"],
+                    "params": (scale[:, None] * kernel, bias + shift @ kernel),
+                }
+            folded.append(layer)
+        return folded
+
+    @property
+    def input_dim(self):
+        return self.layers[0]["params"][0].shape[0]
+
+    def forward(self, x, start=0):
+        for layer in self.layers[start:]:
+            if layer["type"] == "dense":
+                kernel, bias = layer["params"]
+                x = ACTIVATIONS[layer["activation"]](x @ kernel + bias)
+            else:
+                scale, shift = layer["params"]
+                x = x * scale + shift
+        return x
+
+    def predict(self, x, verbose=0, batch_size=None):
+        return self.forward(np.asarray(x, dtype=np.float32))
+
+    def save(self, path):
+        spec, arrays = [], {}
+        for i, layer in enumerate(self.layers):
+            spec.append({"type": layer["type"], "activation": layer.get("activation")})
+            for j, param in enumerate(layer["params"]):
+                arrays[f"layer{i}_{j}"] = param
+        np.savez(path, spec=np.array(json.dumps(spec)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            spec = json.loads(str(data["spec"]))
+            layers = [
+                {
+                    "type": layer["type"],
+                    "activation": layer["activation"],
+                    "params": (data[f"layer{i}_0"], data[f"layer{i}_1"]),
+                }
+                for i, layer in enumerate(spec)
+            ]
+        return cls(layers)
+
+    @classmethod
+    def from_keras(cls, model):
+        layers = []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            config = layer.get_config()
+            weights = [w.astype(np.float32) for w in layer.get_weights()]
+
+            if kind == "Dense":
+                if config["activation"] not in ACTIVATIONS:
+                    raise ValueError(f"Unsupported activation {config['activation']}")
+                if not config.get("use_bias", True):
+                    weights.append(np.zeros(weights[0].shape[1], dtype=np.float32))
+                layers.append(
+                    {
+                        "type": "dense",
+                        "activation": config["activation"],
+                        "params": tuple(weights),
+                    }
+                )
+            elif kind == "BatchNormalization":
+                n = weights[-1].shape[0]
+                weights = list(weights)
+                gamma = weights.pop(0) if config["scale"] else np.ones(n, np.float32)
+                beta = weights.pop(0) if config["center"] else np.zeros(n, np.float32)
+                mean, var = weights
+                scale = gamma / np.sqrt(var + config["epsilon"])
+                layers.append(
+                    {
+                        "type": "affine",
+                        "activation": None,
+                        "params": (scale, beta - mean * scale),
+                    }
+                )
+            elif kind in ("InputLayer", "Dropout"):
+                continue  # no-ops at inference time
+            else:
+                raise ValueError(f"Unsupported layer type {kind}")
+        return cls(layers)
+
+
+class EmbeddedMLP:
+    """
+    NumpyMLP whose inputs are ordinal category codes (features.CategoricalInput).
+    The first dense layer is linear in the codes, so its pre-activation is
+    bias + sum_j code_j * W[j]. Each column gets a table holding
+    code * W[j] for every code (row 0 is the unknown code -1), and a
+    prediction is a dict lookup plus one row gather per column instead of
+    encoder.transform followed by a matmul.
+    """
+
+    def __init__(self, mlp, inputs):
+        first = mlp.layers[0]
+        if first["type"] != "dense":
+            raise ValueError("First layer must be dense")
+        kernel, bias = first["params"]
+        if kernel.shape[0] != len(inputs.columns):
+            raise ValueError(
+                f"ANN expects {kernel.shape[0]} inputs, encoder has {len(inputs.columns)}"
+            )
+        self.mlp = mlp
+        self.inputs = inputs
+        self.bias = bias
+        self.activation = ACTIVATIONS[first["activation"]]
+        self.tables = [
+            np.arange(-1, len(lookup.classes), dtype=np.float32)[:, None] * row
+            for lookup, row in zip(inputs.lookups, kernel)
+        ]
+
+    def predict_frame(self, frame):
+        """Class probabilities for a {column: 1-D array of strings} mapping."""
+        z = self.bias
+        for table, codes in zip(self.tables, self.inputs.codes(frame)):
+            z = z + table[codes + 1]
+        return self.mlp.forward(self.activation(z), start=1)
+
+
+def parity_inputs(input_dim, n_rows=1024, high=10000, seed=0):
+    """Ordinal-code-like inputs (including the -1 unknown code)."""
+    rng = np.random.default_rng(seed)
+    return rng.integers(-1, high, size=(n_rows, input_dim)).astype(np.float32)
+
+
+def check_parity(keras_model, mlp, X, atol=1e-5):
+    """Return (max |prob diff|, argmax agreement) between Keras and NumPy."""
+    expected = keras_model.predict(X, verbose=0)
+    actual = mlp.predict(X)
+    diff = float(np.max(np.abs(expected - actual)))
+    agreement = float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)))
+    return diff, agreement, diff <= atol
+
+
+def _load_keras(path):
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+    from tensorflow.keras.models import load_model
+
+    return load_model(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("keras_path")
+    parser.add_argument("npz_path")
+    args = parser.parse_args()
+
+    keras_model = _load_keras(args.keras_path)
+    if args.command == "export":
+        mlp = NumpyMLP.from_keras(keras_model)
+        mlp.save(args.npz_path)
+        print(f"[+] Exported {len(mlp.layers)} layers to {args.npz_path}")
+    else:
+        mlp = NumpyMLP.load(args.npz_path)
+
+    diff, agreement, ok = check_parity(keras_model, mlp, parity_inputs(mlp.input_dim))
+    status = "[+]" if ok else "[-]"
+    print(f"{status} max |diff| = {diff:.3g}, argmax agreement = {agreement:.2%}")
@@ -0,0 +1,302 @@
+"""
+HTTP load test for the API, driven by the Bruno collection in SEC_project.
+Every request in the collection is replayed at each concurrency level;
+the report has throughput, p50/p95/p99 latency, status codes and the
+Server-Timing stages (e.g. /predict/unified's per-model times).
+
+    python bench_api.py --serve main_test --concurrency 1,8,32
+    python bench_api.py --base http://127.0.0.1:8000 --save before.json
+    python bench_api.py --base http://127.0.0.1:8000 --compare before.json
+
+--serve starts `uvicorn <module>:app` on a free port for the run (main
+for the real artifacts, main_test for the mock); otherwise --base must
+point at a running server.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+BASE = Path(__file__).resolve().parent
+PERCENTILES = (50, 95, 99)
+
+
+# --- Bruno Collection ---
+
+
+def parse_bru(path):
+    """(seq, name, method, path, body) from one .bru request file."""
+    text = Path(path).read_text(encoding="utf-8")
+    request = re.search(r"^(get|post|put|patch|delete) \{\s*url: (\S+)", text, re.M)
+    if request is None:
+        return None
+    seq = re.search(r"^\s*seq: (\d+)", text, re.M)
+    name = re.search(r"^\s*name: (.+)$", text, re.M)
+    body = re.search(r"^body:json \{\n(.*?)\n\}$", text, re.M | re.S)
+    return (
+        int(seq.group(1)) if seq else 0,
+        name.group(1).strip() if name else Path(path).stem,
+        request.group(1).upper(),
+        request.group(2).replace("{{base}}", "/").replace("//", "/"),
+        json.loads(body.group(1)) if body else None,
+    )
+
+
+def load_collection(directory, only=None, exclude=None):
+    scenarios = []
+    for path in sorted(Path(directory).glob("*.bru")):
+        parsed = parse_bru(path)
+        if parsed is None:
+            continue
+        _, name, method, url, body = parsed
+        if only and name not in only:
+            continue
+        if exclude and name in exclude:
+            continue
+        scenarios.append((parsed[0], name, method, url, body))
+    return [s[1:] for s in sorted(scenarios)]
+
+
+# --- Load Generation ---
+
+
+def parse_server_timing(header):
+    """'encode;dur=2.4, ann;dur=23.8' -> {'encode': 2.4, 'ann': 23.8}"""
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        duration = re.search(r"dur=([\d.]+)", params)
+        if name and duration:
+            stages[name] = float(duration.group(1))
+    return stages
+
+
+async def run_scenario(client, method, url, body, requests, concurrency, warmup):
+    latencies, statuses, stages = [], {}, {}
+    queue = asyncio.Queue()
+    for i in range(warmup + requests):
+        queue.put_nowait(i >= warmup)
+
+    async def worker():
+        while not queue.empty():
+            measured = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                await response.aread()
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            if not measured:
+                continue
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            if response is not None:
+                timing = parse_server_timing(response.headers.get("server-timing"))
+                for stage, ms in timing.items():
+                    stages.setdefault(stage, []).append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies = np.asarray(latencies)
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean_ms": round(float(latencies.mean()), 3),
+        **{
+            f"p{p}_ms": round(float(np.percentile(latencies, p)), 3)
+            for p in PERCENTILES
+        },
+        "status": statuses,
+        "stages_p50_ms": {
+            stage: round(float(np.percentile(values, 50)), 3)
+            for stage, values in stages.items()
+        },
+    }
+
+
+async def run_benchmark(base, scenarios, concurrency_levels, requests, warmup):
+    results = {}
+    limits = httpx.Limits(max_connections=max(concurrency_levels))
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+        for name, method, url, body in scenarios:
+            for concurrency in concurrency_levels:
+                result = await run_scenario(
+                    client, method, url, body, requests, concurrency, warmup
+                )
+                results[f"{name} @c{concurrency}"] = result
+                print_row(f"{name} @c{concurrency}", result)
+    return results
+
+
+# --- Reporting ---
+
+
+def print_row(key, r):
+    status = " ".join(f"{code}x{n}" for code, n in sorted(r["status"].items()))
+    print(
+        f"{key:<36} {r['throughput_rps']:>9.1f} rps  p50 {r['p50_ms']:>8.2f}  "
+        f"p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms  [{status}]"
+    )
+    if failures(r):
+        print(
+            f"{'':<36} [-] {failures(r)} non-2xx responses; latencies are not comparable"
+        )
+    if r["stages_p50_ms"]:
+        stages = ", ".join(f"{s} {ms:.1f}" for s, ms in r["stages_p50_ms"].items())
+        print(f"{'':<36} stages p50 (ms): {stages}")
+
+
+def failures(r):
+    """Requests that did not get a 2xx response (errors count too)."""
+    return sum(n for code, n in r["status"].items() if not code.startswith("2"))
+
+
+def compare(results, baseline, threshold):
+    """
+    Print p50/p95/throughput deltas; returns the regressed keys. Any non-2xx
+    response is a regression: a route that fails fast is not faster.
+    """
+    regressions = []
+    print(f"\n[*] Compared with baseline (regression threshold {threshold:.0%}):")
+    for key, r in results.items():
+        if failures(r):
+            regressions.append(key)
+            print(f"[-] {key:<32} {failures(r)} of {r['requests']} requests failed")
+            continue
+        old = baseline.get(key)
+        if old is None:
+            print(f"{key:<36} (not in baseline)")
+            continue
+        deltas = {
+            metric: (r[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            for metric in ("p50_ms", "p95_ms", "throughput_rps")
+        }
+        worse = (
+            deltas["p50_ms"] > threshold
+            or deltas["p95_ms"] > threshold
+            or deltas["throughput_rps"] < -threshold
+        )
+        if worse:
+            regressions.append(key)
+        print(
+            f"{'[-]' if worse else '[+]'} {key:<32} "
+            + "  ".join(f"{m} {d:+.1%}" for m, d in deltas.items())
+        )
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Local Server ---
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(module, timeout=300):
+    """Run `uvicorn <module>:app` and wait until /health answers."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port)],
+        cwd=BASE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn {module}:app exited with {process.returncode}")
+        try:
+            if httpx.get(f"{base}/health", timeout=1).status_code == 200:
+                return process, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"uvicorn {module}:app did not become healthy in {timeout}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base", default="http://127.0.0.1:8000")
+    target.add_argument("--serve", choices=["main", "main_test"])
+    parser.add_argument("--collection", default=str(BASE / "SEC_project"))
+    parser.add_argument("--concurrency", default="1,8", help="comma separated")
+    parser.add_argument("--requests", type=int, default=200, help="per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", help="comma separated request names")
+    parser.add_argument("--exclude", help="comma separated request names")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --save")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    split = lambda text: [v.strip() for v in text.split(",")] if text else None
+    scenarios = load_collection(args.collection, split(args.only), split(args.exclude))
+    levels = [int(c) for c in split(args.concurrency)]
+    print(f"[*] {len(scenarios)} requests x concurrency {levels}")
+
+    server = None
+    base = args.base
+    if args.serve:
+        server, base = start_server(args.serve)
+        print(f"[+] Serving {args.serve}:app at {base}")
+    try:
+        results = asyncio.run(
+            run_benchmark(base, scenarios, levels, args.requests, args.warmup)
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.save:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "target": args.serve or args.base,
+            "env": {
+                k: v
+                for k, v in os.environ.items()
+                if k.startswith(("RF_", "ANN_", "INFERENCE_", "MICROBATCH_", "MODEL_"))
+            },
+            "results": results,
+        }
+        Path(args.save).write_text(json.dumps(report, indent=2))
+        print(f"[+] Saved {args.save}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
@@ -0,0 +1,194 @@
+"""
+Per-model inference micro-benchmark, without HTTP in the way.
+Loads the artifacts main.py serves and times every model on every
+backend it can run on, for each batch size and number of concurrent
+calling threads, printing rows/s and µs/row.
+
+    python bench_models.py
+    python bench_models.py --models CITY_RF,ANN --batch-sizes 1,64 --threads 1,4
+    python bench_models.py --save models.json
+
+Forests are timed on their prebuilt input matrix (model cost only); the
+feedback ANN is timed from string columns, the way main.feedback_model
+calls it, so the numpy-embedded backend's lookup tables are comparable.
+Threads are concurrent callers sharing one model, like INFERENCE_WORKERS.
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+import main
+from ann_runtime import EmbeddedMLP, NumpyMLP
+from features import CategoricalInput, FeatureAssembler
+from forest_engine import compile_forest, compiled_path, load_compiled
+
+BATCH_SIZES = (1, 12, 100, 10_000)
+MODELS = ("RATING_RF", "SALES_RF", "SUCCESS_RF", "CITY_RF", "MONTH_RF", "DT", "ANN")
+
+
+# --- Inputs ---
+
+
+def synthetic_frame(n_rows, seed=0):
+    """n_rows of valid request columns, drawn from the fitted encoders."""
+    rng = np.random.default_rng(seed)
+    frame = {
+        "City": rng.choice(main.models["LE_CITY"].classes_, n_rows),
+        "Cuisine": rng.choice(main.models["LE_CUISINE"].classes_, n_rows),
+        "year": np.full(n_rows, 2024),
+        "month": rng.integers(1, 13, n_rows),
+        "sales_qty": rng.uniform(1, 100, n_rows).round(),
+        "sales_amount": rng.uniform(100, 5000, n_rows).round(2),
+        "Ratings": rng.uniform(1, 5, n_rows).round(1),
+    }
+    encoder = main.models["X_ENC"]
+    for column, categories in zip(main.ANN_COLUMNS, encoder.categories_):
+        if column not in ("City", "Cuisine"):
+            frame[column] = rng.choice(categories, n_rows)
+    return frame
+
+
+# --- Backends ---
+
+
+def forest_backends(name, forest):
+    """{backend: predict function} for one of main.RF_ARTIFACTS."""
+    path = main.RF_ARTIFACTS[name]
+    try:
+        compiled = load_compiled(compiled_path(path), source=path)
+    except (OSError, ValueError):
+        compiled = compile_forest(forest)
+    method = "predict_proba" if hasattr(forest, "predict_proba") else "predict"
+    return {
+        "sklearn": getattr(forest, method),
+        "compiled": getattr(compiled, method),
+    }
+
+
+def ann_backends():
+    """{backend: predict function on a frame} for the feedback ANN."""
+    inputs = CategoricalInput.from_ordinal_encoder(
+        main.models["X_ENC"], main.ANN_COLUMNS
+    )
+    backends = {}
+    try:
+        from tensorflow.keras.models import load_model
+
+        keras = load_model("classificationd_model.keras")
+        backends["keras"] = lambda frame: keras.predict(inputs.encode(frame), verbose=0)
+    except Exception as e:
+        print(f"[-] Skipping keras backend. {type(e).__name__}: {e}")
+    if Path(main.ANN_RUNTIME_PATH).exists():
+        mlp = NumpyMLP.load(main.ANN_RUNTIME_PATH)
+        embedded = EmbeddedMLP(mlp, inputs)
+        backends["numpy"] = lambda frame: mlp.predict(inputs.encode(frame))
+        backends["numpy-embedded"] = embedded.predict_frame
+    else:
+        print(f"[-] Skipping numpy backends: {main.ANN_RUNTIME_PATH} not found.")
+    return backends
+
+
+def model_backends(name):
+    """({backend: predict function}, function building its input from a frame)."""
+    if name == "ANN":
+        return ann_backends(), lambda frame: frame
+    if name == "DT":
+        estimator = main.models["DT"]
+        backends = {"sklearn": estimator.predict}
+    else:
+        estimator = joblib.load(main.RF_ARTIFACTS[name])
+        backends = forest_backends(name, estimator)
+    assembler = FeatureAssembler.for_model(estimator, main.MODEL_COLUMNS[name])
+    return backends, lambda frame: assembler.assemble(main.encode_categories(frame))
+
+
+# --- Timing ---
+
+
+def measure(fn, arg, threads=1, min_seconds=0.5):
+    """(calls, wall seconds) of `threads` callers running fn(arg) repeatedly."""
+    fn(arg)
+
+    def caller(deadline):
+        calls = 0
+        while calls == 0 or time.perf_counter() < deadline:
+            fn(arg)
+            calls += 1
+        return calls, time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        started = time.perf_counter()
+        deadline = started + min_seconds
+        results = list(pool.map(caller, [deadline] * threads))
+    calls = sum(c for c, _ in results)
+    return calls, max(end for _, end in results) - started
+
+
+def bench_model(name, batch_sizes, thread_counts, min_seconds):
+    rows = []
+    backends, model_input = model_backends(name)
+    for batch in batch_sizes:
+        arg = model_input(synthetic_frame(batch))
+        for backend, fn in backends.items():
+            for threads in thread_counts:
+                calls, seconds = measure(fn, arg, threads, min_seconds)
+                # µs/row is the cost at the measured throughput; ms/call is the
+                # mean latency each caller saw.
+                row = {
+                    "model": name,
+                    "backend": backend,
+                    "batch": batch,
+                    "threads": threads,
+                    "rows_per_s": round(calls * batch / seconds, 1),
+                    "us_per_row": round(seconds / (calls * batch) * 1e6, 3),
+                    "ms_per_call": round(seconds * threads / calls * 1000, 3),
+                }
+                rows.append(row)
+                print_row(row)
+    return rows
+
+
+def print_row(r):
+    print(
+        f"{r['model']:<11} {r['backend']:<15} {r['batch']:>7} {r['threads']:>7} "
+        f"{r['rows_per_s']:>13,.0f} {r['us_per_row']:>11.2f} {r['ms_per_call']:>10.3f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--models", default=",".join(MODELS))
+    parser.add_argument("--batch-sizes", default=",".join(map(str, BATCH_SIZES)))
+    parser.add_argument("--threads", default="1", help="comma separated, e.g. 1,4")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="per case")
+    parser.add_argument("--save", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.models.split(",") if n.strip()]
+    unknown = sorted(set(names) - set(MODELS))
+    if unknown:
+        parser.error(f"unknown models: {', '.join(unknown)}")
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    thread_counts = [int(t) for t in args.threads.split(",")]
+
+    for artifact in ("LE_CITY", "LE_CUISINE", "X_ENC", "DT"):
+        main.models.load(artifact)
+
+    print(
+        f"{'model':<11} {'backend':<15} {'batch':>7} {'threads':>7} "
+        f"{'rows/s':>13} {'µs/row':>11} {'ms/call':>10}"
+    )
+    results = []
+    for name in names:
+        results.extend(bench_model(name, batch_sizes, thread_counts, args.min_seconds))
+
+    if args.save:
+        report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+        Path(args.save).write_text(json.dumps(report, indent=2))
+        print(f"[+] Saved {args.save}")
@@ -0,0 +1,162 @@
+"""
+Feature assembly for the tabular models.
+Writes inputs straight into NumPy arrays in the exact column order each
+model was fitted with, so the hot path never builds a pandas DataFrame.
+"""
+
+import threading
+
+import numpy as np
+
+
+class FeatureAssembler:
+    """
+    Column-order aware builder of model input matrices.
+    Single rows are written into a per-thread buffer that is reused across
+    calls; the returned array is only valid until the next call on the
+    same thread, which is fine for an immediate predict().
+    """
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self._local = threading.local()
+
+    @classmethod
+    def for_model(cls, model, fallback=None):
+        """Use the model's fitted `feature_names_in_`, else `fallback`."""
+        columns = getattr(model, "feature_names_in_", None)
+        if columns is None:
+            if fallback is None:
+                raise ValueError(f"{type(model).__name__} has no feature_names_in_")
+            columns = fallback
+        return cls(list(columns))
+
+    def _row_buffer(self):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, len(self.columns)))
+        return buffer
+
+    def row(self, **values):
+        """One (1, n_features) row from scalar keyword arguments."""
+        missing = [c for c in self.columns if c not in values]
+        if missing:
+            raise ValueError(f"Missing features: {missing}")
+        out = self._row_buffer()
+        for i, name in enumerate(self.columns):
+            out[0, i] = values[name]
+        return out
+
+    def assemble(self, frame):
+        """
+        (n_rows, n_features) matrix from a column mapping
+        {name: 1-D array}; uses the reusable buffer when n_rows == 1.
+        """
+        missing = [c for c in self.columns if c not in frame]
+        if missing:
+            raise ValueError(f"Missing features: {missing}")
+        n_rows = len(frame[self.columns[0]])
+        out = (
+            self._row_buffer() if n_rows == 1 else np.empty((n_rows, len(self.columns)))
+        )
+        for i, name in enumerate(self.columns):
+            out[:, i] = frame[name]
+        return out
+
+
+class CategoryLookup:
+    """
+    String -> integer code table for a fitted LabelEncoder, built once.
+    Exact matches win; with `normalize` (the default) values are otherwise
+    compared after strip() and casefold(). Unknown values follow `unknown`:
+    "error" raises ValueError, "first" maps to the first class, an int is
+    used as-is.
+    """
+
+    def __init__(self, classes, unknown="error", label="category", normalize=True):
+        self.classes = np.asarray(classes)
+        self.label = label
+        if unknown not in ("error", "first"):
+            unknown = int(unknown)
+        self.unknown = 0 if unknown == "first" else unknown
+        self.normalized = normalize
+
+        self._codes = {}
+        if normalize:
+            for code, value in enumerate(self.classes.tolist()):
+                self._codes.setdefault(self.normalize(value), code)
+        for code, value in enumerate(self.classes.tolist()):
+            self._codes[value] = code
+
+    @classmethod
+    def from_encoder(cls, encoder, unknown="error", label="category"):
+        return cls(encoder.classes_, unknown=unknown, label=label)
+
+    @staticmethod
+    def normalize(value):
+        return value.strip().casefold() if isinstance(value, str) else value
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None and self.normalized:
+            code = self._codes.get(self.normalize(value))
+        if code is None:
+            if self.unknown == "error":
+                raise ValueError(f"Unknown {self.label}: {value!r}")
+            return self.unknown
+        return code
+
+    def encode(self, values):
+        """1-D int array of codes for an iterable of values."""
+        return np.fromiter((self.code(v) for v in values), dtype=np.intp)
+
+    def known(self, values):
+        """Codes for an iterable of values, -1 where unknown (never raises)."""
+        codes = self._codes
+        if not self.normalized:
+            return np.fromiter((codes.get(v, -1) for v in values), dtype=np.intp)
+        normalize = self.normalize
+        return np.fromiter(
+            (codes.get(v, codes.get(normalize(v), -1)) for v in values),
+            dtype=np.intp,
+        )
+
+    def decode(self, codes):
+        return self.classes[codes]
+
+
+class CategoricalInput:
+    """
+    Dict-based replacement for a fitted OrdinalEncoder: one CategoryLookup
+    per column, unknown values mapped to the encoder's unknown_value.
+    Matching is exact, as in the encoder: "italian " is unknown (-1) here,
+    although the City / Cuisine LabelEncoder lookups would accept it.
+    """
+
+    def __init__(self, columns, lookups):
+        self.columns = tuple(columns)
+        self.lookups = tuple(lookups)
+
+    @classmethod
+    def from_ordinal_encoder(cls, encoder, columns=None):
+        columns = getattr(encoder, "feature_names_in_", columns)
+        if columns is None:
+            raise ValueError("OrdinalEncoder has no feature_names_in_")
+        unknown = getattr(encoder, "unknown_value", None)
+        policy = "error" if unknown is None else int(unknown)
+        lookups = [
+            CategoryLookup(categories, unknown=policy, label=column, normalize=False)
+            for column, categories in zip(columns, encoder.categories_)
+        ]
+        return cls(list(columns), lookups)
+
+    def codes(self, frame):
+        """One int code array per column."""
+        return [
+            lookup.encode(frame[column])
+            for column, lookup in zip(self.columns, self.lookups)
+        ]
+
+    def encode(self, frame):
+        """(n_rows, n_columns) float32 matrix, like OrdinalEncoder.transform."""
+        return np.column_stack(self.codes(frame)).astype(np.float32)
@@ -0,0 +1,289 @@
+"""
+Array-based inference for the fitted random forests.
+Flattens every tree of a sklearn forest into one node table
+(feature / threshold / left / right / leaf value) and walks all trees
+for all rows at once with NumPy, skipping sklearn's per-call overhead.
+
+Parity check against the pickled models:
+    python forest_engine.py model_ratings.pkl model_city.pkl ...
+
+With --export each checked forest is also written next to its pickle as
+<name>.compiled.joblib, whose node tables load memory-mapped so every
+worker process maps the same physical pages:
+    python forest_engine.py --export model_ratings.pkl model_city.pkl ...
+The export records the sha256 of the pickle it was checked against;
+loading it for a retrained pickle fails, so re-export after retraining.
+"""
+
+import argparse
+import hashlib
+import os
+
+import joblib
+import numpy as np
+
+# Upper bound on rows x trees x outputs held in memory per chunk.
+CHUNK_CELLS = 1 << 22
+
+
+class CompiledForest:
+    """
+    Drop-in replacement for a fitted RandomForestRegressor/Classifier
+    exposing predict / predict_proba with the same outputs.
+    """
+
+    def __init__(
+        self,
+        feature,
+        threshold,
+        left,
+        right,
+        missing_left,
+        value,
+        roots,
+        depth,
+        n_features,
+        classes=None,
+        feature_names=None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.n_features_in_ = int(n_features)
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Flatten `forest.estimators_` into a single node table."""
+        is_classifier = hasattr(forest, "classes_")
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests are supported")
+
+        features, thresholds, lefts, rights, missing, values, roots = (
+            [] for _ in range(7)
+        )
+        offset = 0
+        depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            node_ids = np.arange(n) + offset
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so extra traversal steps are no-ops.
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            missing.append(
+                np.asarray(
+                    getattr(tree, "missing_go_to_left", np.zeros(n, dtype=bool)),
+                    dtype=bool,
+                )
+            )
+
+            if is_classifier:
+                value = tree.value[:, 0, :].astype(np.float64)
+                normalizer = value.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                values.append(value / normalizer)
+            else:
+                values.append(tree.value[:, 0, 0].astype(np.float64))
+
+            roots.append(offset)
+            offset += n
+            depth = max(depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            missing_left=np.concatenate(missing),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=depth,
+            n_features=forest.n_features_in_,
+            classes=forest.classes_ if is_classifier else None,
+            feature_names=getattr(forest, "feature_names_in_", None),
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def _as_array(self, X):
+        # Same float32 cast sklearn applies before comparing to thresholds.
+        if self.feature_names_in_ is not None and hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)]
+        return np.asarray(X, dtype=np.float32)
+
+    def apply(self, X):
+        """Leaf node id reached in every tree, shape (n_rows, n_trees)."""
+        X = self._as_array(X)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = np.where(
+                np.isnan(x), self.missing_left[nodes], x <= self.threshold[nodes]
+            )
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def _mean_leaf_value(self, X):
+        X = self._as_array(X)
+        width = self.value.shape[1] if self.value.ndim == 2 else 1
+        chunk = max(1, CHUNK_CELLS // (self.n_estimators * width))
+        parts = [
+            self.value[self.apply(X[start : start + chunk])].mean(axis=1)
+            for start in range(0, X.shape[0], chunk)
+        ]
+        if not parts:
+            raise ValueError("Found array with 0 sample(s)")
+        return np.concatenate(parts)
+
+    def predict_proba(self, X):
+        if self.classes_ is None:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._mean_leaf_value(X)
+
+    def predict(self, X):
+        if self.classes_ is None:
+            return self._mean_leaf_value(X)
+        return self.classes_[np.argmax(self._mean_leaf_value(X), axis=1)]
+
+
+def parity_sample(compiled, n_rows=512, seed=0):
+    """
+    Random rows spanning every feature's split range, with a share of
+    values sitting exactly on split thresholds (the <= edge case).
+    """
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n_rows, compiled.n_features_in_), dtype=np.float64)
+    for f in range(compiled.n_features_in_):
+        splits = compiled.threshold[
+            (compiled.feature == f) & (compiled.left != np.arange(len(compiled.left)))
+        ]
+        if splits.size == 0:
+            continue
+        lo, hi = splits.min(), splits.max()
+        span = (hi - lo) or 1.0
+        X[:, f] = rng.uniform(lo - 0.1 * span, hi + 0.1 * span, n_rows)
+        on_split = rng.random(n_rows) < 0.2
+        X[on_split, f] = rng.choice(splits, on_split.sum())
+    if compiled.feature_names_in_ is not None:
+        import pandas as pd
+
+        return pd.DataFrame(X, columns=compiled.feature_names_in_)
+    return X
+
+
+def verify_parity(forest, compiled, X, rtol=1e-9, atol=1e-9):
+    """
+    Compare sklearn and compiled outputs on X.
+    Returns (max absolute difference, within tolerance).
+    """
+    if compiled.classes_ is not None:
+        expected, actual = forest.predict_proba(X), compiled.predict_proba(X)
+    else:
+        expected, actual = forest.predict(X), compiled.predict(X)
+    diff = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+    return diff, bool(np.allclose(expected, actual, rtol=rtol, atol=atol))
+
+
+def compile_forest(forest, check=True):
+    """Compile a forest, optionally refusing it if it diverges from sklearn."""
+    compiled = CompiledForest.from_sklearn(forest)
+    if check:
+        diff, ok = verify_parity(forest, compiled, parity_sample(compiled))
+        if not ok:
+            raise ValueError(f"Compiled forest diverges from sklearn (max diff {diff})")
+    return compiled
+
+
+def compiled_path(path):
+    """Where the compiled twin of a pickled forest lives."""
+    return os.path.splitext(path)[0] + ".compiled.joblib"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_compiled(compiled, path, source=None):
+    """
+    Dump the node tables as a dict of plain arrays (no pickled class, so
+    the file loads the same whichever module wrote it). Uncompressed on
+    purpose: compressed joblib files cannot be memory-mapped. `source` is
+    the pickle the forest was compiled and parity-checked from.
+    """
+    state = {
+        name: getattr(compiled, name)
+        for name in (
+            "feature",
+            "threshold",
+            "left",
+            "right",
+            "missing_left",
+            "value",
+            "roots",
+            "depth",
+        )
+    }
+    state.update(
+        n_features=compiled.n_features_in_,
+        classes=compiled.classes_,
+        feature_names=compiled.feature_names_in_,
+        source_sha256=file_sha256(source) if source else None,
+    )
+    joblib.dump(state, path)
+
+
+def load_compiled(path, mmap_mode="r", source=None):
+    """
+    Load a compiled forest. With mmap_mode="r" the node tables are
+    read-only views of the file, backed by the OS page cache and shared
+    by every process that maps it instead of copied into each one.
+    With `source`, raises ValueError unless the file was exported from
+    that exact pickle.
+    """
+    state = joblib.load(path, mmap_mode=mmap_mode)
+    exported_from = state.pop("source_sha256", None)
+    if source is not None and exported_from != file_sha256(source):
+        raise ValueError(f"{path} was not exported from the current {source}")
+    return CompiledForest(**state)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+", help="pickled sklearn forests")
+    parser.add_argument(
+        "--export",
+        action="store_true",
+        help="write <name>.compiled.joblib for every forest that passes",
+    )
+    args = parser.parse_args()
+
+    for path in args.paths:
+        forest = joblib.load(path)
+        compiled = CompiledForest.from_sklearn(forest)
+        diff, ok = verify_parity(forest, compiled, parity_sample(compiled))
+        status = "[+]" if ok else "[-]"
+        print(
+            f"{status} {path}: {compiled.n_estimators} trees, "
+            f"{len(compiled.feature)} nodes, max |diff| = {diff:.3g}"
+        )
+        if args.export and ok:
+            save_compiled(compiled, compiled_path(path), source=path)
+            print(f"[+] Exported {compiled_path(path)}")
@@ -0,0 +1,145 @@
+"""
+Gemini calls for the unified endpoint, behind a result cache, a hard
+deadline and a circuit breaker. The model object comes from an injectable
+factory, so a local fake can stand in for google.generativeai:
+
+    class FakeModel:
+        async def generate_content_async(self, prompt, stream=False):
+            ...
+
+    client = GeminiClient(model_factory=FakeModel, timeout=0.5)
+"""
+
+import asyncio
+
+from serving import CircuitBreaker, TTLCache
+
+
+class GeminiUnavailable(Exception):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+def parse_buckets(spec) -> dict:
+    """'sales_qty=10,sales_amount=1000' -> {'sales_qty': 10.0, ...}"""
+    buckets = {}
+    for item in (spec or "").split(","):
+        if item.strip():
+            name, step = item.split("=")
+            buckets[name.strip()] = float(step)
+    return buckets
+
+
+def normalize_inputs(inputs: dict, buckets=None) -> tuple:
+    """
+    Hashable cache key for a dict of prompt inputs: strings are
+    whitespace-collapsed and casefolded, numbers are compared as floats and
+    rounded to their bucket step when one is given.
+    """
+    buckets = buckets or {}
+    key = []
+    for name in sorted(inputs):
+        value = inputs[name]
+        if isinstance(value, str):
+            value = " ".join(value.split()).casefold()
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            step = buckets.get(name)
+            value = round(round(value / step) * step, 9) if step else float(value)
+        key.append((name, value))
+    return tuple(key)
+
+
+class GeminiClient:
+    """
+    generate() / stream() with caching keyed on normalize_inputs(inputs),
+    a `timeout` in seconds for the whole call, and a CircuitBreaker that
+    raises GeminiUnavailable instead of calling a failing API. Only
+    complete, successful answers are cached.
+    """
+
+    def __init__(
+        self, model_factory, timeout=15.0, cache=None, breaker=None, buckets=None
+    ):
+        self.model_factory = model_factory
+        self.timeout = timeout
+        self.cache = cache if cache is not None else TTLCache()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.buckets = buckets or {}
+
+    def cache_key(self, inputs):
+        return normalize_inputs(inputs, self.buckets)
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise GeminiUnavailable(
+                f"Circuit open after {self.breaker.failures} consecutive failures"
+            )
+
+    async def generate(self, prompt, inputs) -> str:
+        key = self.cache_key(inputs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        self._check_breaker()
+        try:
+            response = await asyncio.wait_for(
+                self.model_factory().generate_content_async(prompt), self.timeout
+            )
+            text = response.text.strip()
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled, or the streaming client went away: no verdict on Gemini.
+            self.breaker.release()
+            raise
+
+        self.breaker.record_success()
+        self.cache.put(key, text)
+        return text
+
+    async def stream(self, prompt, inputs):
+        """Yield text chunks; a cache hit is yielded as a single chunk."""
+        key = self.cache_key(inputs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        self._check_breaker()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        parts = []
+        try:
+            response = await asyncio.wait_for(
+                self.model_factory().generate_content_async(prompt, stream=True),
+                self.timeout,
+            )
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        chunks.__anext__(), deadline - loop.time()
+                    )
+                except StopAsyncIteration:
+                    break
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled, or the streaming client went away: no verdict on Gemini.
+            self.breaker.release()
+            raise
+
+        self.breaker.record_success()
+        self.cache.put(key, "".join(parts).strip())
+
+    def stats(self):
+        return {
+            "timeout_seconds": self.timeout,
+            "cache": self.cache.stats(),
+            "circuit_breaker": self.breaker.stats(),
+        }
@@ -0,0 +1,280 @@
+"""
+Parallel, resumable image downloader for the image classifier's dataset.
+Fetches (name, url) jobs on a bounded thread pool sharing one pooled
+requests.Session, retrying connection errors, timeouts, 429 and 5xx with
+exponential backoff, and records every outcome in a JSONL manifest in the
+output directory.
+
+    python image_downloader.py products.csv food_images
+    python image_downloader.py products.parquet food_images --workers 32
+    python image_downloader.py products.csv food_images --retry-failed
+
+Rows are saved as img_{row}.jpg, the names Image_Classification_Model.ipynb
+sorts into score folders. A rerun skips every name the manifest has as
+downloaded whose file is still in the output directory or one of its
+subfolders (so sorted images count), so an interrupted build picks up
+where it stopped. Images are deduplicated by sha256: a second copy of the
+same bytes is recorded as a duplicate of the first and not written, so
+identical pictures cannot land on both sides of the train/val split.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from table_io import read_chunks
+
+MANIFEST = "manifest.jsonl"
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 60.0
+
+
+# --- Fetching ---
+
+
+def make_session(pool_size):
+    """Session keeping up to pool_size connections per host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def retry_delay(attempt, backoff, response=None):
+    """Seconds to wait before retry `attempt` (1-based)."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+    # Full jitter keeps the workers from retrying a struggling host in step.
+    return random.uniform(0, backoff * 2 ** (attempt - 1))
+
+
+def fetch(session, url, timeout=10.0, retries=3, backoff=0.5):
+    """
+    (content, error, attempts) of a GET. Transient failures are retried up
+    to `retries` times; content is None and error says why once they are
+    used up, or straight away for any other failure (e.g. a 404).
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        response = None
+        try:
+            response = session.get(url, timeout=timeout)
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                return response.content, None, attempt
+            error = f"HTTP {response.status_code}"
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = f"{type(e).__name__}: {e}"
+        except requests.RequestException as e:
+            return None, f"{type(e).__name__}: {e}", attempt
+        if attempt > retries:
+            return None, error, attempt
+        time.sleep(retry_delay(attempt, backoff, response))
+
+
+# --- Manifest ---
+
+
+def read_manifest(path):
+    """{name: latest record} of a manifest; later lines win."""
+    records = {}
+    if Path(path).exists():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write leaves a partial last line;
+                    # _open_manifest starts the next run on a fresh one.
+                    continue
+                records[record["name"]] = record
+    return records
+
+
+def _open_manifest(path):
+    """The manifest for appending, starting a new line after a partial one."""
+    manifest = open(path, "a+b")
+    if manifest.tell():
+        manifest.seek(-1, os.SEEK_END)
+        if manifest.read(1) != b"\n":
+            manifest.write(b"\n")
+    return manifest
+
+
+def existing_files(out_dir):
+    """
+    {file name: path} of the files in out_dir and its subfolders; the
+    notebook moves downloaded images into one subfolder per score label.
+    """
+    found = {}
+    for path in [*out_dir.glob("*/*"), *out_dir.glob("*")]:
+        if path.is_file():
+            found[path.name] = path
+    return found
+
+
+def _write_atomic(path, content):
+    partial = path.with_name(path.name + ".part")
+    partial.write_bytes(content)
+    os.replace(partial, path)
+
+
+# --- Downloading ---
+
+
+def download_images(
+    jobs,
+    out_dir,
+    workers=16,
+    timeout=10.0,
+    retries=3,
+    backoff=0.5,
+    retry_failed=False,
+    session=None,
+):
+    """
+    Download (name, url) jobs into out_dir. Returns the number of jobs
+    downloaded now, resumed (on disk from an earlier run), duplicate and
+    failed, plus the bytes written and `files`, the images of these jobs
+    on disk. Workers only fetch; hashing, writing and the manifest are
+    handled here, so at most 2 * workers images are held in memory.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST
+    done = read_manifest(manifest_path)
+    files = existing_files(out_dir)
+    digests = {
+        r["sha256"]: name
+        for name, r in done.items()
+        if r["status"] == "ok" and name in files
+    }
+    stats = {"downloaded": 0, "resumed": 0, "duplicate": 0, "failed": 0, "bytes": 0}
+    session = session or make_session(workers)
+    started = time.perf_counter()
+
+    def record(manifest, entry):
+        manifest.write(json.dumps(entry).encode() + b"\n")
+        manifest.flush()
+
+    def finish(manifest, future, name, url):
+        content, error, attempts = future.result()
+        entry = {"name": name, "url": url, "attempts": attempts}
+        if content is None:
+            entry.update(status="failed", error=error)
+            stats["failed"] += 1
+        else:
+            digest = hashlib.sha256(content).hexdigest()
+            entry.update(sha256=digest, bytes=len(content))
+            if digest in digests:
+                entry.update(status="duplicate", duplicate_of=digests[digest])
+                stats["duplicate"] += 1
+            else:
+                _write_atomic(out_dir / name, content)
+                files[name] = out_dir / name
+                digests[digest] = name
+                entry.update(status="ok")
+                stats["downloaded"] += 1
+                stats["bytes"] += len(content)
+        record(manifest, entry)
+
+    def previous_outcome(previous, url):
+        """The stats key of a job settled by an earlier run, else None."""
+        if previous is None or previous["url"] != url:
+            return None
+        if previous["status"] == "ok" and previous["name"] in files:
+            return "resumed"
+        if previous["status"] == "duplicate" and previous.get("duplicate_of") in files:
+            return "duplicate"
+        if previous["status"] == "failed" and (not url or not retry_failed):
+            return "failed"
+        return None
+
+    with _open_manifest(manifest_path) as manifest, ThreadPoolExecutor(
+        max_workers=workers
+    ) as pool:
+        pending = {}
+        for name, url in jobs:
+            url = url or None
+            outcome = previous_outcome(done.get(name), url)
+            if outcome is not None:
+                stats[outcome] += 1
+                continue
+            if url is None:
+                record(
+                    manifest,
+                    {"name": name, "url": None, "status": "failed", "error": "no url"},
+                )
+                stats["failed"] += 1
+                continue
+            future = pool.submit(fetch, session, url, timeout, retries, backoff)
+            pending[future] = (name, url)
+            if len(pending) >= 2 * workers:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    finish(manifest, future, *pending.pop(future))
+        for future in list(pending):
+            finish(manifest, future, *pending.pop(future))
+
+    stats["files"] = stats["downloaded"] + stats["resumed"]
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def table_jobs(path, url_column="image_url", name_format="img_{}.jpg"):
+    """(name, url) per row of a CSV/Parquet/XLSX table, named by row number."""
+    row = 0
+    for chunk in read_chunks(path):
+        for url in chunk[url_column]:
+            yield name_format.format(row), url if isinstance(url, str) else None
+            row += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("table", help="CSV, Parquet or XLSX with one row per image")
+    parser.add_argument("out_dir")
+    parser.add_argument("--url-column", default="image_url")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=0.5, help="seconds")
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="retry urls the manifest has as failed",
+    )
+    args = parser.parse_args()
+
+    print(f"[*] Downloading {args.table} into {args.out_dir} ({args.workers} workers)")
+    stats = download_images(
+        table_jobs(args.table, args.url_column),
+        args.out_dir,
+        workers=args.workers,
+        timeout=args.timeout,
+        retries=args.retries,
+        backoff=args.backoff,
+        retry_failed=args.retry_failed,
+    )
+    print(
+        f"[+] {stats['downloaded']} downloaded ({stats['bytes'] / 1e6:.1f} MB) and "
+        f"{stats['resumed']} from earlier runs in {stats['seconds']}s: "
+        f"{stats['files']} images, {stats['duplicate']} duplicates skipped"
+    )
+    if stats["failed"]:
+        print(f"[-] {stats['failed']} failed; see {Path(args.out_dir) / MANIFEST}")
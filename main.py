@@ -1,26 +1,166 @@
+import asyncio
+import functools
+import itertools
 import os
+import time
+import uuid
 import warnings
 import joblib
 import numpy as np
-import pandas as pd
+
+# Imported before the parallel loader threads unpickle their estimators;
+# concurrent first imports of sklearn fail on partially initialised modules.
+import sklearn.ensemble  # noqa: F401
+import sklearn.preprocessing  # noqa: F401
+import sklearn.tree  # noqa: F401
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional, Union
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 
+from ann_runtime import EmbeddedMLP, NumpyMLP
+from features import CategoricalInput, CategoryLookup, FeatureAssembler
+from forest_engine import compile_forest, compiled_path, load_compiled
+from gemini_client import GeminiClient, GeminiUnavailable, parse_buckets
+from pipeline import ANN_COLUMNS, MODEL_COLUMNS, model_pipeline
+from responses import NumpyJSONResponse, dumps, negotiated_response
+from serving import (
+    CircuitBreaker,
+    ExecutorBusy,
+    InferenceExecutor,
+    MicroBatcher,
+    ModelRegistry,
+    TTLCache,
+)
+from sweep import DEFAULT_CHUNK_ROWS, SweepGrid, score_frame
+from table_io import FORMATS, check_format, stream_table
+
 # --- ENV/Warning Mute ---
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 warnings.filterwarnings("ignore", category=UserWarning)
 load_dotenv()
-# --- Lazy TF Import ---
-from tensorflow.keras.models import load_model
 
 # --- Gemini Integration ---
 import google.generativeai as genai
 
 # --- Model Cache ---
-models = {}
+# MODEL_LOADING=eager (default, parallel before serving) | background (parallel,
+# after startup; /ready flips once done) | lazy (each artifact on first use)
+MODEL_LOADING = os.environ.get("MODEL_LOADING", "eager")
+MODEL_LOAD_WORKERS = int(os.environ.get("MODEL_LOAD_WORKERS", "0")) or None
+models = ModelRegistry(lazy=MODEL_LOADING == "lazy")
+
+# --- Inference Executor ---
+# INFERENCE_EXECUTOR=thread|process, INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE
+inference = InferenceExecutor.from_env()
+RETRY_AFTER_SECONDS = os.environ.get("INFERENCE_RETRY_AFTER", "1")
+
+# --- Forest Backend ---
+# RF_BACKEND=sklearn (default) | compiled (NumPy node tables, see forest_engine)
+# Compiled forests exported with `forest_engine.py --export` are memory-mapped
+# (RF_MMAP_MODE, default "r"; empty to read into memory) so all workers on a
+# host share one copy of the node tables.
+RF_BACKEND = os.environ.get("RF_BACKEND", "sklearn")
+RF_MMAP_MODE = os.environ.get("RF_MMAP_MODE", "r") or None
+RF_ARTIFACTS = {
+    "RATING_RF": "model_ratings.pkl",
+    "SALES_RF": "model_sales.pkl",
+    "SUCCESS_RF": "model_success.pkl",
+    "CITY_RF": "model_city.pkl",
+    "MONTH_RF": "model_month.pkl",
+}
+
+
+def load_forest(name, path):
+    """Load a forest, swapped for its compiled twin if it passes the parity check."""
+    if RF_BACKEND == "compiled" and os.path.exists(compiled_path(path)):
+        # An export is only used for the pickle it was parity-checked against.
+        try:
+            compiled = load_compiled(
+                compiled_path(path), mmap_mode=RF_MMAP_MODE, source=path
+            )
+            print(
+                f"[+] {name} loaded from {compiled_path(path)} (mmap={RF_MMAP_MODE})."
+            )
+            return compiled
+        except ValueError as e:
+            print(f"[-] WARNING: {e}; compiling {name} in memory. Re-export it.")
+
+    forest = joblib.load(path)
+    if RF_BACKEND != "compiled":
+        return forest
+    try:
+        compiled = compile_forest(forest)
+        print(f"[+] {name} compiled ({compiled.n_estimators} trees).")
+        return compiled
+    except Exception as e:
+        print(f"[-] WARNING: {name} stays on sklearn backend. {e}")
+        return forest
+
+
+# --- ANN Backend ---
+# ANN_BACKEND=keras (default) | numpy (TensorFlow-free, see ann_runtime)
+ANN_BACKEND = os.environ.get("ANN_BACKEND", "keras")
+ANN_RUNTIME_PATH = os.environ.get("ANN_RUNTIME_PATH", "feedback_ann.npz")
+
+
+def load_ann():
+    if ANN_BACKEND == "numpy":
+        return NumpyMLP.load(ANN_RUNTIME_PATH)
+
+    # --- Lazy TF Import ---
+    from tensorflow.keras.models import load_model
+
+    return load_model("classificationd_model.keras")
+
+
+def load_feedback_classes():
+    return joblib.load("feedback_encoder.joblib").categories_[0]
+
+
+models.register("ANN", load_ann)
+models.register("DT", functools.partial(joblib.load, "regression_model.joblib"))
+models.register("X_ENC", functools.partial(joblib.load, "restaurant_encoder.joblib"))
+models.register("FB_CLASSES", load_feedback_classes)
+for _name, _path in RF_ARTIFACTS.items():
+    models.register(_name, functools.partial(load_forest, _name, _path))
+models.register("LE_CITY", functools.partial(joblib.load, "encoder_city.pkl"))
+models.register("LE_CUISINE", functools.partial(joblib.load, "encoder_cuisine.pkl"))
+
+
+def load_artifacts(names=None):
+    """Load every registered artifact, or just `names`, in parallel into 'models'."""
+    started = time.perf_counter()
+    failed = models.load_all(MODEL_LOAD_WORKERS, names)
+    for name in failed:
+        print(f"[-] FATAL: {name} failed to load. {models.status[name]['error']}")
+    if not failed:
+        print(
+            f"[+] All systems go. {len(names or models.loaders)} artifacts loaded in {time.perf_counter() - started:.1f}s."
+        )
+    return failed
+
+
+# Startup work that runs while the app already serves; cancelled on shutdown.
+background_tasks = set()
+
+
+def start_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+async def load_models():
+    """Parallel load off the event loop, then kick off dependent warm-ups."""
+    await asyncio.to_thread(load_artifacts)
+    if os.environ.get("MATRIX_CACHE_WARM") == "1" and "CITY_RF" in models:
+        # Serving starts now; the cache fills in behind it.
+        start_background(warm_matrix_cache())
 
 
 @asynccontextmanager
@@ -29,44 +169,44 @@ async def lifespan(app: FastAPI):
     Load all models into the 'models' dict on startup.
     Handles artifact loading and clears cache on shutdown.
     """
-    try:
-        print("[*] Locking and loading analytical models...")
+    print("[*] Locking and loading analytical models...")
 
-        # Check for API Key
-        if "GEMINI_API_KEY" not in os.environ:
-            print(
-                "[-] WARNING: GEMINI_API_KEY not found in environment variables. Generative features will fail."
-            )
-        else:
-            genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-            print("[+] Gemini configured.")
-
-        models["ANN"] = load_model("classificationd_model.keras")
-        models["DT"] = joblib.load("regression_model.joblib")
-        models["X_ENC"] = joblib.load("restaurant_encoder.joblib")
-
-        fb_enc = joblib.load("feedback_encoder.joblib")
-        models["FB_CLASSES"] = fb_enc.categories_[0]
-
-        models["RATING_RF"] = joblib.load("model_ratings.pkl")
-        models["SALES_RF"] = joblib.load("model_sales.pkl")
-        models["SUCCESS_RF"] = joblib.load("model_success.pkl")
-        models["CITY_RF"] = joblib.load("model_city.pkl")
-        models["MONTH_RF"] = joblib.load("model_month.pkl")
-
-        models["LE_CITY"] = joblib.load("encoder_city.pkl")
-        models["LE_CUISINE"] = joblib.load("encoder_cuisine.pkl")
-
-        print(f"[+] All systems go. {len(models)} artifacts loaded.")
-    except FileNotFoundError as e:
-        print(f"[-] FATAL: Missing artifact. Check your directory. {e}")
-    except Exception as e:
-        print(f"[-] FATAL: Model load failed. {e}")
+    # Check for API Key
+    if "GEMINI_API_KEY" not in os.environ:
+        print(
+            "[-] WARNING: GEMINI_API_KEY not found in environment variables. Generative features will fail."
+        )
+    else:
+        genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+        print("[+] Gemini configured.")
+
+    # Process workers hold their own copy of the artifacts.
+    inference.start(initializer=load_artifacts if inference.kind == "process" else None)
+    print(
+        f"[+] Inference executor: {inference.kind} x{inference.workers}, queue {inference.max_queue}."
+    )
+
+    if MODEL_LOADING == "eager":
+        await load_models()
+    elif MODEL_LOADING == "background":
+        start_background(load_models())
+    else:
+        print("[*] Lazy loading: artifacts load on first use.")
 
     yield
 
     # --- Shutdown ---
     print("[*] Clearing model cache...")
+    tasks = list(background_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    inference.shutdown()
+    matrix_cache.clear()
+    gemini.cache.clear()
+    assemblers.clear()
+    lookups.clear()
+    feedback_runtime.clear()
     models.clear()
 
 
@@ -74,6 +214,7 @@ app = FastAPI(
     title="Model-API-Hybrid",
     description="Endpoints for ANN Feedback, DT Sales, RF Ratings, Monthly Sales & Success Prob + Gemini Insight.",
     lifespan=lifespan,
+    default_response_class=NumpyJSONResponse,
 )
 origins = ["http://localhost:3000", "*"]
 
@@ -154,46 +295,378 @@ class MatrixFeatures(BaseModel):
     Cuisine: str
 
 
+# --- Feature Frames ---
+
+
+MAX_BATCH_ROWS = int(os.environ.get("MAX_BATCH_ROWS", "50000"))
+
+
+@functools.cache
+def column_adapter(kind) -> TypeAdapter:
+    return TypeAdapter(List[kind])
+
+
+def validate_column(name, kind, values) -> list:
+    """A columnar field checked with the same rules as a row's field."""
+    try:
+        return column_adapter(kind).validate_python(values)
+    except ValidationError as e:
+        error = e.errors()[0]
+        where = f" (row {error['loc'][0]})" if error["loc"] else ""
+        raise ValueError(f"Column {name}{where}: {error['msg']}") from None
+
+
+def features_frame(payload, schema) -> dict:
+    """
+    Build a column mapping {field: 1-D array} from a request payload.
+    Accepts either a list of Pydantic rows or columnar arrays
+    ({"field": [v1, v2, ...]}); columns are validated against the schema's
+    field types, so 2022.7 or null is rejected as it is in a row.
+    """
+    fields = schema.__annotations__
+
+    if isinstance(payload, dict):
+        missing = [f for f in fields if f not in payload]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+        columns = {
+            name: validate_column(name, kind, payload[name])
+            for name, kind in fields.items()
+        }
+    else:
+        columns = {name: [getattr(row, name) for row in payload] for name in fields}
+
+    frame = {
+        name: np.asarray(columns[name], dtype=kind if kind in (int, float) else object)
+        for name, kind in fields.items()
+    }
+    lengths = {len(v) for v in frame.values()}
+    if len(lengths) > 1:
+        raise ValueError("All columns must have the same length")
+    if frame_length(frame) > MAX_BATCH_ROWS:
+        raise ValueError(
+            f"Batch of {frame_length(frame)} rows exceeds limit {MAX_BATCH_ROWS}"
+        )
+    return frame
+
+
+def frame_length(frame: dict) -> int:
+    return len(next(iter(frame.values())))
+
+
+# How City/Cuisine values missing from the encoders are handled:
+# CATEGORY_UNKNOWN=error (default, 422) | first (first class) | <int code>
+CATEGORY_UNKNOWN = os.environ.get("CATEGORY_UNKNOWN", "error")
+lookups = {}
+
+
+def category_lookup(name) -> CategoryLookup:
+    """Dict-based code table for a label encoder, built on first use."""
+    lookup = lookups.get(name)
+    if lookup is None:
+        label = "City" if name == "LE_CITY" else "Cuisine"
+        lookup = CategoryLookup.from_encoder(
+            models[name], unknown=CATEGORY_UNKNOWN, label=label
+        )
+        lookups[name] = lookup
+    return lookup
+
+
+def encode_categories(frame: dict) -> dict:
+    """City/Cuisine label encoding for a whole frame."""
+    if "City" in frame and "City_encoded" not in frame:
+        frame["City_encoded"] = category_lookup("LE_CITY").encode(frame["City"])
+    if "Cuisine" in frame and "Cuisine_encoded" not in frame:
+        frame["Cuisine_encoded"] = category_lookup("LE_CUISINE").encode(
+            frame["Cuisine"]
+        )
+    return frame
+
+
+# MODEL_COLUMNS (pipeline.py) is the fallback column order for models
+# pickled without feature_names_in_.
+assemblers = {}
+
+
+def model_input(name, frame: dict) -> np.ndarray:
+    """The model's input matrix, in its fitted column order, without pandas."""
+    assembler = assemblers.get(name)
+    if assembler is None:
+        assembler = FeatureAssembler.for_model(models[name], MODEL_COLUMNS[name])
+        assemblers[name] = assembler
+    return assembler.assemble(encode_categories(frame))
+
+
+# --- Batch Inference ---
+# One vectorized predict / predict_proba per call; the single-row endpoints
+# are the 1-row case of these.
+
+
+feedback_runtime = {}
+
+
+def feedback_model():
+    """
+    X_ENC + ANN as one callable on a frame. X_ENC's categories become dict
+    lookups; on the NumPy backend they also index precomputed first-layer
+    tables (ann_runtime.EmbeddedMLP), so no encoded matrix is built at all.
+    """
+    model = feedback_runtime.get("ANN")
+    if model is None:
+        inputs = CategoricalInput.from_ordinal_encoder(models["X_ENC"], ANN_COLUMNS)
+        ann = models["ANN"]
+        if isinstance(ann, NumpyMLP):
+            model = EmbeddedMLP(ann, inputs).predict_frame
+        else:
+
+            def model(frame):
+                return ann.predict(inputs.encode(frame), verbose=0)
+
+        feedback_runtime["ANN"] = model
+    return model
+
+
+def call_model(name, method, frame: dict):
+    """One model on a frame; how the shared pipeline reaches this API's models."""
+    if name == "ANN":
+        return feedback_model()(frame)
+    return getattr(models[name], method)(model_input(name, frame))
+
+
+# Every model as a stage of one graph (see pipeline.py); the endpoints run
+# single stages, /predict/unified a subset of them.
+PIPELINE = model_pipeline(call_model)
+
+
+def run_stage(name, frame: dict) -> dict:
+    return PIPELINE[name](frame)
+
+
+def feedback_rows(outputs: dict) -> list:
+    predicted_classes = models["FB_CLASSES"][
+        np.argmax(outputs["feedback_proba"], axis=1)
+    ]
+    return [{"feedback_prediction": c} for c in predicted_classes]
+
+
+def sales_rows(outputs: dict) -> list:
+    return [{"high_sales_prediction": int(p)} for p in outputs["high_sales_prediction"]]
+
+
+def rf_rating_rows(outputs: dict) -> list:
+    return [{"rf_rating_prediction": float(p)} for p in outputs["rf_rating_prediction"]]
+
+
+def rf_monthly_sales_rows(outputs: dict) -> list:
+    return [{"rf_sales_prediction": float(p)} for p in outputs["rf_sales_prediction"]]
+
+
+def top_k(probs, k=3):
+    """Column indices of the k largest probabilities per row, and their %."""
+    idx = np.argsort(probs, axis=1)[:, -k:][:, ::-1]
+    return idx, (np.take_along_axis(probs, idx, axis=1) * 100).round(2)
+
+
+def rf_city_recommend_rows(outputs: dict) -> list:
+    top3_idx, top3_probs = top_k(outputs["city_proba"])
+    top3_cities = category_lookup("LE_CITY").decode(top3_idx.ravel())
+    top3_cities = top3_cities.reshape(top3_idx.shape)
+
+    return [
+        {
+            "top_3_recommendations": [
+                {"city": city, "probability_percent": float(prob)}
+                for city, prob in zip(cities, row_probs)
+            ]
+        }
+        for cities, row_probs in zip(top3_cities, top3_probs)
+    ]
+
+
+def rf_success_prob_rows(outputs: dict) -> list:
+    success_probs = outputs["success_proba"][:, 1] * 100
+    return [
+        {
+            "success_probability_percentage": round(float(p), 2),
+            "is_successful": bool(p > 50),
+        }
+        for p in success_probs
+    ]
+
+
+def rf_month_recommend_rows(outputs: dict) -> list:
+    top3_idx, top3_probs = top_k(outputs["month_proba"])
+    top3_months = top3_idx + 1
+
+    return [
+        {
+            "top_3_month_recommendations": [
+                {"month": int(month), "probability_percent": float(prob)}
+                for month, prob in zip(months, row_probs)
+            ]
+        }
+        for months, row_probs in zip(top3_months, top3_probs)
+    ]
+
+
+def run_feedback(frame: dict) -> list:
+    return feedback_rows(run_stage("ann", frame))
+
+
+def run_sales(frame: dict) -> list:
+    return sales_rows(run_stage("dt", frame))
+
+
+def run_rf_rating(frame: dict) -> list:
+    return rf_rating_rows(run_stage("rf_rating", frame))
+
+
+def run_rf_monthly_sales(frame: dict) -> list:
+    return rf_monthly_sales_rows(run_stage("rf_sales", frame))
+
+
+def run_rf_city_recommend(frame: dict) -> list:
+    return rf_city_recommend_rows(run_stage("rf_city", frame))
+
+
+def run_rf_success_prob(frame: dict) -> list:
+    return rf_success_prob_rows(run_stage("rf_success", frame))
+
+
+def run_rf_month_recommend(frame: dict) -> list:
+    return rf_month_recommend_rows(run_stage("rf_month", frame))
+
+
+def predict_rows(fn, payload, schema) -> list:
+    """Parse + score in one job, so large batches never block the event loop."""
+    frame = features_frame(payload, schema)
+    if frame_length(frame) == 0:
+        return []
+    return fn(frame)
+
+
+def batch_response(predictions: list) -> NumpyJSONResponse:
+    # Returned as a Response so tens of thousands of rows skip the
+    # jsonable_encoder walk (~0.3 s for 50k rows, on the event loop).
+    return NumpyJSONResponse({"count": len(predictions), "predictions": predictions})
+
+
+@asynccontextmanager
+async def inference_errors(error_label):
+    """Map inference failures onto the API's HTTP errors (503 / 422 / 500)."""
+    try:
+        yield
+    except ExecutorBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": RETRY_AFTER_SECONDS},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid input data: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{error_label}: {str(e)}")
+
+
+async def dispatch(error_label, fn, *args):
+    """Run a sync inference callable on the executor."""
+    async with inference_errors(error_label):
+        return await inference.run(fn, *args)
+
+
+# --- Micro-Batching ---
+# Concurrent single-row calls to the same model are coalesced into one
+# batched predict. MICROBATCH_WINDOW_MS=0 disables it.
+MICROBATCH_WINDOW_MS = float(os.environ.get("MICROBATCH_WINDOW_MS", "2"))
+MICROBATCH_MAX_ROWS = int(os.environ.get("MICROBATCH_MAX_ROWS", "64"))
+
+batchers = {
+    "ANN": MicroBatcher(
+        functools.partial(predict_rows, run_feedback, schema=RestaurantFeatures),
+        inference,
+        window_ms=MICROBATCH_WINDOW_MS,
+        max_rows=MICROBATCH_MAX_ROWS,
+    ),
+    "SUCCESS_RF": MicroBatcher(
+        functools.partial(predict_rows, run_rf_success_prob, schema=SuccessFeatures),
+        inference,
+        window_ms=MICROBATCH_WINDOW_MS,
+        max_rows=MICROBATCH_MAX_ROWS,
+    ),
+}
+
+
 # --- Core Endpoints ---
 
 
 @app.get("/health")
 async def health_check():
-    """Health check to verify model loading."""
-    if not models:
-        raise HTTPException(
-            status_code=503, detail="Models are offline or failed to load"
-        )
-    return {"status": "online", "models_loaded": list(models.keys())}
+    """Liveness check: the process is up. Model readiness lives at /ready."""
+    return {
+        "status": "online" if not models.failed else "degraded",
+        "models_loaded": list(models.keys()),
+        "inference": inference.stats(),
+        "micro_batching": {name: b.stats() for name, b in batchers.items()},
+        "caches": {"market_matrix": matrix_cache.stats()},
+        "gemini": gemini.stats(),
+    }
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check with per-model load state and load time."""
+    report = {
+        "ready": models.ready,
+        "loading": MODEL_LOADING,
+        "models": models.status,
+    }
+    if not models.ready:
+        raise HTTPException(status_code=503, detail=report)
+    return report
 
 
 @app.post("/predict/feedback")
 async def predict_feedback(features: RestaurantFeatures):
     if "ANN" not in models:
         raise HTTPException(status_code=503, detail="ANN Model unavailable")
-    try:
-        data_df = pd.DataFrame([features.dict()])
-        data_df = data_df[["Resturant_Name", "Cuisine", "Location", "City"]]
-        encoded_data = models["X_ENC"].transform(data_df)
-        prediction_probs = models["ANN"].predict(encoded_data, verbose=0)
-        predicted_index = np.argmax(prediction_probs[0])
-        predicted_class = models["FB_CLASSES"][predicted_index]
-        return {"feedback_prediction": predicted_class}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    async with inference_errors("Feedback Error"):
+        return await batchers["ANN"].submit(features)
+
+
+@app.post("/predict/feedback/batch")
+async def predict_feedback_batch(
+    batch: Union[List[RestaurantFeatures], Dict[str, list]],
+):
+    if "ANN" not in models:
+        raise HTTPException(status_code=503, detail="ANN Model unavailable")
+
+    predictions = await dispatch(
+        "Feedback Error", predict_rows, run_feedback, batch, RestaurantFeatures
+    )
+    return batch_response(predictions)
 
 
 @app.post("/predict/sales")
 async def predict_sales(features: SalesFeatures):
     if "DT" not in models:
         raise HTTPException(status_code=503, detail="DT Model unavailable")
-    try:
-        data_df = pd.DataFrame([features.dict()])
-        data_df = data_df[["sales_qty", "Ratings"]]
-        prediction = models["DT"].predict(data_df)
-        return {"high_sales_prediction": int(prediction[0])}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    rows = await dispatch(
+        "Sales Error", predict_rows, run_sales, [features], SalesFeatures
+    )
+    return rows[0]
+
+
+@app.post("/predict/sales/batch")
+async def predict_sales_batch(batch: Union[List[SalesFeatures], Dict[str, list]]):
+    if "DT" not in models:
+        raise HTTPException(status_code=503, detail="DT Model unavailable")
+
+    predictions = await dispatch(
+        "Sales Error", predict_rows, run_sales, batch, SalesFeatures
+    )
+    return batch_response(predictions)
 
 
 # --- Business Logic RF Endpoints ---
@@ -204,30 +677,21 @@ async def predict_rf_rating(features: RatingFeatures):
     if "RATING_RF" not in models:
         raise HTTPException(status_code=503, detail="Rating RF Model unavailable")
 
-    try:
-        city_enc = models["LE_CITY"].transform([features.City])[0]
-        cuisine_enc = models["LE_CUISINE"].transform([features.Cuisine])[0]
-
-        data = pd.DataFrame(
-            [
-                {
-                    "year": features.year,
-                    "month": features.month,
-                    "sales_qty": features.sales_qty,
-                    "sales_amount": features.sales_amount,
-                    "City_encoded": city_enc,
-                    "Cuisine_encoded": cuisine_enc,
-                }
-            ]
-        )
+    rows = await dispatch(
+        "RF Rating Error", predict_rows, run_rf_rating, [features], RatingFeatures
+    )
+    return rows[0]
 
-        prediction = models["RATING_RF"].predict(data)
-        return {"rf_rating_prediction": float(prediction[0])}
 
-    except ValueError as e:
-        raise HTTPException(status_code=422, detail=f"Invalid input data: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"RF Rating Error: {str(e)}")
+@app.post("/predict/rf_rating/batch")
+async def predict_rf_rating_batch(batch: Union[List[RatingFeatures], Dict[str, list]]):
+    if "RATING_RF" not in models:
+        raise HTTPException(status_code=503, detail="Rating RF Model unavailable")
+
+    predictions = await dispatch(
+        "RF Rating Error", predict_rows, run_rf_rating, batch, RatingFeatures
+    )
+    return batch_response(predictions)
 
 
 @app.post("/predict/rf_monthly_sales")
@@ -235,30 +699,31 @@ async def predict_rf_monthly_sales(features: SalesPredictFeatures):
     if "SALES_RF" not in models:
         raise HTTPException(status_code=503, detail="Sales RF Model unavailable")
 
-    try:
-        city_enc = models["LE_CITY"].transform([features.City])[0]
-        cuisine_enc = models["LE_CUISINE"].transform([features.Cuisine])[0]
-
-        data = pd.DataFrame(
-            [
-                {
-                    "year": features.year,
-                    "month": features.month,
-                    "sales_qty": features.sales_qty,
-                    "Ratings": features.Ratings,
-                    "City_encoded": city_enc,
-                    "Cuisine_encoded": cuisine_enc,
-                }
-            ]
-        )
+    rows = await dispatch(
+        "RF Sales Error",
+        predict_rows,
+        run_rf_monthly_sales,
+        [features],
+        SalesPredictFeatures,
+    )
+    return rows[0]
 
-        prediction = models["SALES_RF"].predict(data)
-        return {"rf_sales_prediction": float(prediction[0])}
 
-    except ValueError as e:
-        raise HTTPException(status_code=422, detail=f"Invalid input data: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"RF Sales Error: {str(e)}")
+@app.post("/predict/rf_monthly_sales/batch")
+async def predict_rf_monthly_sales_batch(
+    batch: Union[List[SalesPredictFeatures], Dict[str, list]],
+):
+    if "SALES_RF" not in models:
+        raise HTTPException(status_code=503, detail="Sales RF Model unavailable")
+
+    predictions = await dispatch(
+        "RF Sales Error",
+        predict_rows,
+        run_rf_monthly_sales,
+        batch,
+        SalesPredictFeatures,
+    )
+    return batch_response(predictions)
 
 
 @app.post("/predict/rf_city_recommend")
@@ -270,41 +735,31 @@ async def predict_rf_city_recommend(features: CityRecommendFeatures):
     if "CITY_RF" not in models or "LE_CITY" not in models:
         raise HTTPException(status_code=503, detail="City RF Model unavailable")
 
-    try:
-        cuisine_enc = models["LE_CUISINE"].transform([features.Cuisine])[0]
-
-        data = pd.DataFrame(
-            [
-                {
-                    "Cuisine_encoded": cuisine_enc,
-                    "Ratings": features.Ratings,
-                    "sales_qty": features.sales_qty,
-                    "sales_amount": features.sales_amount,
-                    "year": features.year,
-                    "month": features.month,
-                }
-            ]
-        )
-
-        # Get probabilities
-        probs = models["CITY_RF"].predict_proba(data)[0]
+    rows = await dispatch(
+        "City Model Error",
+        predict_rows,
+        run_rf_city_recommend,
+        [features],
+        CityRecommendFeatures,
+    )
+    return rows[0]
 
-        # Sort and slice Top 3
-        top3_idx = np.argsort(probs)[-3:][::-1]
-        top3_cities = models["LE_CITY"].inverse_transform(top3_idx)
-        top3_probs = (probs[top3_idx] * 100).round(2)
 
-        return {
-            "top_3_recommendations": [
-                {"city": city, "probability_percent": prob}
-                for city, prob in zip(top3_cities, top3_probs)
-            ]
-        }
+@app.post("/predict/rf_city_recommend/batch")
+async def predict_rf_city_recommend_batch(
+    batch: Union[List[CityRecommendFeatures], Dict[str, list]],
+):
+    if "CITY_RF" not in models or "LE_CITY" not in models:
+        raise HTTPException(status_code=503, detail="City RF Model unavailable")
 
-    except ValueError as e:
-        raise HTTPException(status_code=422, detail=f"Invalid input data: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"City Model Error: {str(e)}")
+    predictions = await dispatch(
+        "City Model Error",
+        predict_rows,
+        run_rf_city_recommend,
+        batch,
+        CityRecommendFeatures,
+    )
+    return batch_response(predictions)
 
 
 @app.post("/predict/rf_success_prob")
@@ -312,36 +767,21 @@ async def predict_rf_success_prob(features: SuccessFeatures):
     if "SUCCESS_RF" not in models:
         raise HTTPException(status_code=503, detail="Success RF Model unavailable")
 
-    try:
-        city_enc = models["LE_CITY"].transform([features.City])[0]
-        cuisine_enc = models["LE_CUISINE"].transform([features.Cuisine])[0]
-
-        data = pd.DataFrame(
-            [
-                {
-                    "Ratings": features.Ratings,
-                    "sales_qty": features.sales_qty,
-                    "sales_amount": features.sales_amount,
-                    "City_encoded": city_enc,
-                    "Cuisine_encoded": cuisine_enc,
-                    "year": features.year,
-                    "month": features.month,
-                }
-            ]
-        )
+    async with inference_errors("Success Model Error"):
+        return await batchers["SUCCESS_RF"].submit(features)
 
-        probs = models["SUCCESS_RF"].predict_proba(data)[0]
-        success_prob = probs[1] * 100
 
-        return {
-            "success_probability_percentage": round(float(success_prob), 2),
-            "is_successful": bool(success_prob > 50),
-        }
+@app.post("/predict/rf_success_prob/batch")
+async def predict_rf_success_prob_batch(
+    batch: Union[List[SuccessFeatures], Dict[str, list]],
+):
+    if "SUCCESS_RF" not in models:
+        raise HTTPException(status_code=503, detail="Success RF Model unavailable")
 
-    except ValueError as e:
-        raise HTTPException(status_code=422, detail=f"Invalid input data: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Success Model Error: {str(e)}")
+    predictions = await dispatch(
+        "Success Model Error", predict_rows, run_rf_success_prob, batch, SuccessFeatures
+    )
+    return batch_response(predictions)
 
 
 @app.post("/predict/rf_month_recommend")
@@ -349,104 +789,284 @@ async def predict_rf_month_recommend(features: MonthRecommendFeatures):
     if "MONTH_RF" not in models:
         raise HTTPException(status_code=503, detail="Month RF Model unavailable")
 
-    try:
-        city_enc = models["LE_CITY"].transform([features.City])[0]
-        cuisine_enc = models["LE_CUISINE"].transform([features.Cuisine])[0]
-
-        data = pd.DataFrame(
-            [
-                {
-                    "Ratings": features.Ratings,
-                    "sales_qty": features.sales_qty,
-                    "sales_amount": features.sales_amount,
-                    "City_encoded": city_enc,
-                    "Cuisine_encoded": cuisine_enc,
-                    "year": features.year,
-                }
-            ]
-        )
+    rows = await dispatch(
+        "Month Model Error",
+        predict_rows,
+        run_rf_month_recommend,
+        [features],
+        MonthRecommendFeatures,
+    )
+    return rows[0]
+
+
+@app.post("/predict/rf_month_recommend/batch")
+async def predict_rf_month_recommend_batch(
+    batch: Union[List[MonthRecommendFeatures], Dict[str, list]],
+):
+    if "MONTH_RF" not in models:
+        raise HTTPException(status_code=503, detail="Month RF Model unavailable")
+
+    predictions = await dispatch(
+        "Month Model Error",
+        predict_rows,
+        run_rf_month_recommend,
+        batch,
+        MonthRecommendFeatures,
+    )
+    return batch_response(predictions)
+
+
+# --- Market Matrix ---
+# The matrix depends only on these inputs, so results are cached on them
+# (Cuisine by its encoded code: "Italian" and " italian" share an entry).
+MATRIX_KEY_FIELDS = ("Ratings", "sales_qty", "sales_amount", "year")
+
+matrix_cache = TTLCache(
+    maxsize=int(os.environ.get("MATRIX_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("MATRIX_CACHE_TTL", "3600")),
+)
 
-        probs = models["MONTH_RF"].predict_proba(data)[0]
-        top3_idx = np.argsort(probs)[-3:][::-1]
-        top3_months = top3_idx + 1
-        top3_probs = (probs[top3_idx] * 100).round(2)
 
+def matrix_key(features) -> tuple:
+    cuisine = category_lookup("LE_CUISINE").code(features.Cuisine)
+    return (cuisine, *(getattr(features, field) for field in MATRIX_KEY_FIELDS))
+
+
+MONTH_KEYS = tuple(f"Month_{m}" for m in range(1, 13))
+MatrixFormat = Literal["nested", "columnar"]
+
+
+def matrix_block(all_probs, all_cities) -> dict:
+    """
+    Compact form of a 12 x n_cities probability block: percentages rounded
+    once with NumPy. This is what the cache holds; see matrix_payload.
+    """
+    return {
+        "cities": all_cities,
+        "percent": np.round(all_probs * 100, 2),
+        "global_percent": np.round(all_probs.mean(axis=0) * 100, 2),
+    }
+
+
+def matrix_payload(block, matrix_format="nested") -> dict:
+    """
+    Render a matrix block as the API response.
+    nested:   {"market_matrix": {city: {"Month_1": pct, ...}}, ...}
+    columnar: {"cities": [...], "months": [1..12],
+               "market_matrix": 12 x n_cities list (row = month), ...}
+    """
+    cities = block["cities"].tolist()
+    global_metrics = block["global_percent"].tolist()
+    if matrix_format == "columnar":
         return {
-            "top_3_month_recommendations": [
-                {"month": int(month), "probability_percent": prob}
-                for month, prob in zip(top3_months, top3_probs)
-            ]
+            "cities": cities,
+            "months": list(range(1, 13)),
+            "market_matrix": block["percent"].tolist(),
+            "city_global_probabilities": global_metrics,
         }
 
-    except ValueError as e:
-        raise HTTPException(status_code=422, detail=f"Invalid input data: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Month Model Error: {str(e)}")
+    by_city = block["percent"].T.tolist()
+    return {
+        "market_matrix": {
+            city: dict(zip(MONTH_KEYS, row)) for city, row in zip(cities, by_city)
+        },
+        "city_global_probabilities": dict(zip(cities, global_metrics)),
+    }
 
 
-@app.post("/predict/market_matrix")
-async def predict_market_matrix(features: MatrixFeatures):
+def run_market_matrices(feature_rows) -> list:
     """
-    Merged Scenario: Generates a full probability matrix.
+    Merged Scenario: Generates a full probability matrix per input.
     Iterates all 12 months against the City Model to find the probability
-    of EVERY city being the target for EVERY month.
+    of EVERY city being the target for EVERY month, for all inputs at once.
     """
-    if "CITY_RF" not in models or "LE_CITY" not in models:
-        raise HTTPException(
-            status_code=503, detail="City RF Model or Encoder unavailable"
+    n = len(feature_rows)
+    all_cities = models["LE_CITY"].classes_
+    cuisine_codes = category_lookup("LE_CUISINE").encode(
+        f.Cuisine for f in feature_rows
+    )
+
+    # One 12-month block per input, scored in a single predict_proba
+    batch = model_input(
+        "CITY_RF",
+        {
+            "Cuisine_encoded": np.repeat(cuisine_codes, 12),
+            "Ratings": np.repeat([f.Ratings for f in feature_rows], 12),
+            "sales_qty": np.repeat([f.sales_qty for f in feature_rows], 12),
+            "sales_amount": np.repeat([f.sales_amount for f in feature_rows], 12),
+            "year": np.repeat([f.year for f in feature_rows], 12),
+            "month": np.tile(np.arange(1, 13), n),
+        },
+    )
+
+    all_probs = models["CITY_RF"].predict_proba(batch).reshape(n, 12, -1)
+    return [matrix_block(probs, all_cities) for probs in all_probs]
+
+
+async def cached_market_matrix(features) -> dict:
+    key = matrix_key(features)
+    result = matrix_cache.get(key)
+    if result is None:
+        result = (await inference.run(run_market_matrices, [features]))[0]
+        matrix_cache.put(key, result)
+    return result
+
+
+def env_grid(name, default, cast=float) -> list:
+    return [cast(v) for v in os.environ.get(name, default).split(",") if v.strip()]
+
+
+async def warm_matrix_cache(chunk_size=256):
+    """
+    Precompute the matrix for every known cuisine on a small input grid
+    (MATRIX_WARM_YEARS / _RATINGS / _QTY / _AMOUNT, comma separated).
+    """
+    grid = list(
+        itertools.product(
+            env_grid("MATRIX_WARM_YEARS", "2024", int),
+            env_grid("MATRIX_WARM_RATINGS", "3.5,4.0,4.5"),
+            env_grid("MATRIX_WARM_QTY", "20"),
+            env_grid("MATRIX_WARM_AMOUNT", "1500"),
+        )
+    )
+    rows = [
+        MatrixFeatures(
+            Cuisine=cuisine,
+            year=year,
+            Ratings=rating,
+            sales_qty=qty,
+            sales_amount=amount,
+        )
+        for cuisine in models["LE_CUISINE"].classes_
+        for year, rating, qty, amount in grid
+    ]
+    if len(rows) > matrix_cache.maxsize:
+        print(
+            f"[-] WARNING: Warm grid has {len(rows)} entries, cache holds {matrix_cache.maxsize}. Truncating."
         )
+        rows = rows[: matrix_cache.maxsize]
 
+    started = time.perf_counter()
     try:
-        # 1. Encode Cuisine Once
-        cuisine_enc = models["LE_CUISINE"].transform([features.Cuisine])[0]
-
-        # 2. Get all available cities from the encoder classes
-        all_cities = models["LE_CITY"].classes_
-
-        # 3. Create a batch DataFrame for 12 months
-        batch_data = []
-        for m in range(1, 13):
-            batch_data.append(
-                {
-                    "Cuisine_encoded": cuisine_enc,
-                    "Ratings": features.Ratings,
-                    "sales_qty": features.sales_qty,
-                    "sales_amount": features.sales_amount,
-                    "year": features.year,
-                    "month": m,
-                }
-            )
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size]
+            results = await inference.run(run_market_matrices, chunk)
+            for features, result in zip(chunk, results):
+                matrix_cache.put(matrix_key(features), result)
+    except Exception as e:
+        print(f"[-] Market matrix warm-up failed: {e}")
+        return
 
-        df_batch = pd.DataFrame(batch_data)
+    print(
+        f"[+] Market matrix cache warmed: {len(rows)} entries in {time.perf_counter() - started:.1f}s."
+    )
 
-        # 4. Run Inference ONCE for the batch
-        all_probs = models["CITY_RF"].predict_proba(df_batch)
 
-        # 5. Calculate Global Aggregates
-        avg_city_probs = np.mean(all_probs, axis=0)
+@app.post("/predict/market_matrix")
+async def predict_market_matrix(
+    features: MatrixFeatures,
+    request: Request,
+    matrix_format: MatrixFormat = "nested",
+):
+    """Full city x month probability grid for one cuisine (see matrix_payload)."""
+    if "CITY_RF" not in models or "LE_CITY" not in models:
+        raise HTTPException(
+            status_code=503, detail="City RF Model or Encoder unavailable"
+        )
 
-        global_metrics = {
-            city: round(prob * 100, 2) for city, prob in zip(all_cities, avg_city_probs)
+    async with inference_errors("Matrix Calculation Error"):
+        block = await cached_market_matrix(features)
+    return negotiated_response(request, matrix_payload(block, matrix_format))
+
+
+# --- Scenario Sweep ---
+# Every City x Cuisine x month over value grids, scored by the five forests
+# (see sweep.py); streamed as CSV or Parquet.
+SWEEP_MAX_ROWS = int(os.environ.get("SWEEP_MAX_ROWS", "5000000"))
+SWEEP_CHUNK_ROWS = int(os.environ.get("SWEEP_CHUNK_ROWS", str(DEFAULT_CHUNK_ROWS)))
+SWEEP_MODELS = ["RATING_RF", "SALES_RF", "SUCCESS_RF", "CITY_RF", "MONTH_RF"]
+
+
+class SweepRequest(BaseModel):
+    """Values to sweep per input; City / Cuisine default to every known class."""
+
+    City: Optional[List[str]] = None
+    Cuisine: Optional[List[str]] = None
+    year: List[int] = [2024]
+    month: List[int] = list(range(1, 13))
+    sales_qty: List[float]
+    sales_amount: List[float]
+    Ratings: List[float]
+
+
+def sweep_axis(encoder, values):
+    lookup = category_lookup(encoder)
+    if values is None:
+        codes = np.arange(len(lookup.classes))
+    else:
+        codes = lookup.encode(values)
+    return lookup.classes[codes], codes
+
+
+def sweep_grid(request: SweepRequest) -> SweepGrid:
+    if any(m < 1 or m > 12 for m in request.month):
+        raise ValueError("month values must be between 1 and 12")
+    return SweepGrid(
+        {
+            "City": sweep_axis("LE_CITY", request.City),
+            "Cuisine": sweep_axis("LE_CUISINE", request.Cuisine),
+            "year": request.year,
+            "month": request.month,
+            "sales_qty": request.sales_qty,
+            "sales_amount": request.sales_amount,
+            "Ratings": request.Ratings,
         }
+    )
 
-        # 6. Construct the Grid
-        matrix = {city: {} for city in all_cities}
 
-        for month_idx, month_probs in enumerate(all_probs):
-            month_key = f"Month_{month_idx + 1}"
-            for city_idx, city_name in enumerate(all_cities):
-                prob = month_probs[city_idx]
-                matrix[city_name][month_key] = round(prob * 100, 2)
+def run_sweep_chunk(grid: SweepGrid, start, stop) -> dict:
+    return score_frame(grid.frame(start, stop), models, model_input)
 
-        return {"market_matrix": matrix, "city_global_probabilities": global_metrics}
 
+@app.post("/predict/sweep")
+async def predict_sweep(
+    request: SweepRequest, output_format: Literal["csv", "parquet"] = "csv"
+):
+    """Streams one row per scenario with every forest's prediction."""
+    if any(m not in models for m in SWEEP_MODELS + ["LE_CITY", "LE_CUISINE"]):
+        raise HTTPException(
+            status_code=503, detail="One or more models failed to load."
+        )
+    try:
+        check_format(output_format)
+        grid = sweep_grid(request)
     except ValueError as e:
-        raise HTTPException(status_code=422, detail=f"Invalid input data: {e}")
-    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Invalid sweep: {e}")
+    if grid.n_rows > SWEEP_MAX_ROWS:
         raise HTTPException(
-            status_code=500, detail=f"Matrix Calculation Error: {str(e)}"
+            status_code=422,
+            detail=f"Sweep has {grid.n_rows} rows, the limit is {SWEEP_MAX_ROWS}.",
         )
 
+    async def chunks():
+        for start, stop in grid.ranges(SWEEP_CHUNK_ROWS):
+            while True:
+                try:
+                    yield await inference.run(run_sweep_chunk, grid, start, stop)
+                    break
+                except ExecutorBusy:
+                    # A sweep is a long download; wait for capacity instead of failing.
+                    await asyncio.sleep(float(RETRY_AFTER_SECONDS))
+
+    return StreamingResponse(
+        stream_table(chunks(), output_format),
+        media_type=FORMATS[output_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="sweep.{output_format}"',
+            "X-Sweep-Rows": str(grid.n_rows),
+        },
+    )
+
 
 # --- NEW UNIFIED SECTION WITH GEMINI ---
 
@@ -465,10 +1085,52 @@ class UnifiedFeatures(BaseModel):
     Ratings: float
 
 
-@app.post("/predict/unified")
-async def predict_unified(features: UnifiedFeatures):
+# Steps 1-5 of the unified endpoint: result key -> (pipeline stage, rows).
+# They only share the encoded input frame, so the pipeline runs them
+# concurrently; stage names double as Server-Timing names.
+UNIFIED_STAGES = {
+    "feedback_prediction": ("ann", feedback_rows),  # 1. ANN Feedback
+    "high_sales_prediction": ("dt", sales_rows),  # 2. DT Sales
+    "rf_rating_prediction": ("rf_rating", rf_rating_rows),  # 3. RF Rating
+    "rf_monthly_sales": ("rf_sales", rf_monthly_sales_rows),  # 4. RF Monthly Sales
+    "rf_success_prob": ("rf_success", rf_success_prob_rows),  # 5. RF Success
+}
+UNIFIED_PIPELINE = PIPELINE.subset([stage for stage, _ in UNIFIED_STAGES.values()])
+UNIFIED_LOG_TIMINGS = os.environ.get("UNIFIED_LOG_TIMINGS") == "1"
+
+
+def unified_frame(features) -> dict:
+    """Encode the categorical inputs once for every stage."""
+    return encode_categories(features_frame([features], UnifiedFeatures))
+
+
+def unified_stage_runner(timings):
+    def runner(stage, frame):
+        # By name, so process workers run their own copy of the stage.
+        return timed(timings, stage.name, inference.run(run_stage, stage.name, frame))
+
+    return runner
+
+
+async def timed(timings, name, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+
+def server_timing(timings) -> str:
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+
+async def unified_predictions(
+    features, timings, matrix_format="nested", on_stages=None
+) -> dict:
     """
-    Runs all models + Gemini Analysis.
+    Steps 1-6 of the unified endpoint, with per-stage wall times in ms.
+    on_stages(results) is called with steps 1-5 before waiting for the
+    market matrix, so work that only needs them (Gemini) overlaps it.
     """
     # Check model availability
     required_models = ["ANN", "DT", "RATING_RF", "SALES_RF", "SUCCESS_RF", "CITY_RF"]
@@ -477,165 +1139,231 @@ async def predict_unified(features: UnifiedFeatures):
             status_code=503, detail="One or more models failed to load."
         )
 
-    results = {}
+    async with inference_errors("Unified Error"):
+        frame = await timed(timings, "encode", inference.run(unified_frame, features))
 
-    try:
-        # 1. ANN Feedback
-        ann_df = pd.DataFrame(
-            [
-                {
-                    "Resturant_Name": features.Resturant_Name,
-                    "Cuisine": features.Cuisine,
-                    "Location": features.Location,
-                    "City": features.City,
-                }
-            ]
+        # 6. Market Matrix (Vectorized, cached) runs alongside steps 1-5.
+        matrix_task = asyncio.ensure_future(
+            timed(timings, "market_matrix", cached_market_matrix(features))
         )
-        ann_encoded = models["X_ENC"].transform(ann_df)
-        ann_probs = models["ANN"].predict(ann_encoded, verbose=0)
-        ann_index = np.argmax(ann_probs[0])
-        results["feedback_prediction"] = {
-            "feedback_prediction": models["FB_CLASSES"][ann_index]
-        }
+        try:
+            outputs = await UNIFIED_PIPELINE.run_async(
+                frame, unified_stage_runner(timings)
+            )
+            results = {
+                key: rows(outputs)[0] for key, (_, rows) in UNIFIED_STAGES.items()
+            }
+            if on_stages is not None:
+                on_stages(results)
+            results["market_matrix"] = matrix_payload(await matrix_task, matrix_format)
+        finally:
+            matrix_task.cancel()
+    return results
+
+
+# --- 7. Gemini AI Analysis ---
+GEMINI_MODEL = "models/gemini-flash-latest"
+GEMINI_KEY_MISSING = "API Key missing. AI analysis skipped."
+GEMINI_FAILED = "AI analysis failed due to an internal error."
+GEMINI_UNAVAILABLE = "AI analysis is temporarily unavailable. Please try again shortly."
+
+
+def gemini_prompt(features, results) -> str:
+    return f"""
+            Act as a data-driven business consultant for a restaurant chain. 
+            Analyze the following restaurant data and predictive model outputs.
+            
+            Restaurant Input: {features.dict()}
+            
+            Model Predictions:
+            - Feedback Sentiment: {results["feedback_prediction"]}
+            - High Sales Potential: {results["high_sales_prediction"]}
+            - Predicted Rating: {results["rf_rating_prediction"]}
+            - Monthly Sales Forecast: {results["rf_monthly_sales"]}
+            - Success Probability: {results["rf_success_prob"]}
+            
+            Provide a concise, actionable recommendation (max 3 sentences) on how to improve the business or maintain success. Focus on the relationship between ratings, sales, and cuisine fit for the location.
+            """
+
+
+# Recommendations are cached on the normalized restaurant inputs (the model
+# outputs in the prompt are a function of them). GEMINI_CACHE_BUCKETS, e.g.
+# "sales_qty=10,sales_amount=1000,Ratings=0.1", lets nearby inputs share one.
+gemini = GeminiClient(
+    model_factory=functools.partial(genai.GenerativeModel, GEMINI_MODEL),
+    timeout=float(os.environ.get("GEMINI_TIMEOUT", "15")),
+    cache=TTLCache(
+        maxsize=int(os.environ.get("GEMINI_CACHE_SIZE", "1024")),
+        ttl=float(os.environ.get("GEMINI_CACHE_TTL", "86400")),
+    ),
+    breaker=CircuitBreaker(
+        failures=int(os.environ.get("GEMINI_BREAKER_FAILURES", "5")),
+        reset_after=float(os.environ.get("GEMINI_BREAKER_RESET", "30")),
+    ),
+    buckets=parse_buckets(os.environ.get("GEMINI_CACHE_BUCKETS")),
+)
 
-        # 2. DT Sales
-        dt_df = pd.DataFrame(
-            [{"sales_qty": features.sales_qty, "Ratings": features.Ratings}]
-        )
-        dt_pred = models["DT"].predict(dt_df)
-        results["high_sales_prediction"] = {"high_sales_prediction": int(dt_pred[0])}
-
-        # Pre-computation for RFs
-        city_enc = models["LE_CITY"].transform([features.City])[0]
-        cuisine_enc = models["LE_CUISINE"].transform([features.Cuisine])[0]
-
-        # 3. RF Rating
-        rf_rating_df = pd.DataFrame(
-            [
-                {
-                    "year": features.year,
-                    "month": features.month,
-                    "sales_qty": features.sales_qty,
-                    "sales_amount": features.sales_amount,
-                    "City_encoded": city_enc,
-                    "Cuisine_encoded": cuisine_enc,
-                }
-            ]
-        )
-        rf_rating_pred = models["RATING_RF"].predict(rf_rating_df)
-        results["rf_rating_prediction"] = {
-            "rf_rating_prediction": float(rf_rating_pred[0])
-        }
 
-        # 4. RF Monthly Sales
-        rf_sales_df = pd.DataFrame(
-            [
-                {
-                    "year": features.year,
-                    "month": features.month,
-                    "sales_qty": features.sales_qty,
-                    "Ratings": features.Ratings,
-                    "City_encoded": city_enc,
-                    "Cuisine_encoded": cuisine_enc,
-                }
-            ]
-        )
-        rf_sales_pred = models["SALES_RF"].predict(rf_sales_df)
-        results["rf_monthly_sales"] = {"rf_sales_prediction": float(rf_sales_pred[0])}
-
-        # 5. RF Success Probability
-        rf_success_df = pd.DataFrame(
-            [
-                {
-                    "Ratings": features.Ratings,
-                    "sales_qty": features.sales_qty,
-                    "sales_amount": features.sales_amount,
-                    "City_encoded": city_enc,
-                    "Cuisine_encoded": cuisine_enc,
-                    "year": features.year,
-                    "month": features.month,
-                }
-            ]
-        )
-        success_probs = models["SUCCESS_RF"].predict_proba(rf_success_df)[0]
-        success_prob_val = success_probs[1] * 100
-        results["rf_success_prob"] = {
-            "success_probability_percentage": round(float(success_prob_val), 2),
-            "is_successful": bool(success_prob_val > 50),
-        }
+def gemini_error(g_ex) -> str:
+    if isinstance(g_ex, GeminiUnavailable):
+        return GEMINI_UNAVAILABLE
+    if isinstance(g_ex, asyncio.TimeoutError):
+        print(f"[-] Gemini API Error: no answer within {gemini.timeout}s")
+    else:
+        print(f"[-] Gemini API Error: {g_ex}")
+    return GEMINI_FAILED
 
-        # 6. Market Matrix (Vectorized)
-        all_cities = models["LE_CITY"].classes_
-        batch_data = []
-        for m in range(1, 13):
-            batch_data.append(
-                {
-                    "Cuisine_encoded": cuisine_enc,
-                    "Ratings": features.Ratings,
-                    "sales_qty": features.sales_qty,
-                    "sales_amount": features.sales_amount,
-                    "year": features.year,
-                    "month": m,
-                }
-            )
-        df_batch = pd.DataFrame(batch_data)
-        all_probs = models["CITY_RF"].predict_proba(df_batch)
-        avg_city_probs = np.mean(all_probs, axis=0)
-        global_metrics = {
-            city: round(prob * 100, 2) for city, prob in zip(all_cities, avg_city_probs)
-        }
-        matrix = {city: {} for city in all_cities}
-        for month_idx, month_probs in enumerate(all_probs):
-            month_key = f"Month_{month_idx + 1}"
-            for city_idx, city_name in enumerate(all_cities):
-                prob = month_probs[city_idx]
-                matrix[city_name][month_key] = round(prob * 100, 2)
-
-        results["market_matrix"] = {
-            "market_matrix": matrix,
-            "city_global_probabilities": global_metrics,
-        }
 
-        # --- 7. Gemini AI Analysis ---
-        try:
-            if "GEMINI_API_KEY" in os.environ:
-                # Prepare the prompt
-                prompt_text = f"""
-                Act as a data-driven business consultant for a restaurant chain. 
-                Analyze the following restaurant data and predictive model outputs.
-                
-                Restaurant Input: {features.dict()}
-                
-                Model Predictions:
-                - Feedback Sentiment: {results["feedback_prediction"]}
-                - High Sales Potential: {results["high_sales_prediction"]}
-                - Predicted Rating: {results["rf_rating_prediction"]}
-                - Monthly Sales Forecast: {results["rf_monthly_sales"]}
-                - Success Probability: {results["rf_success_prob"]}
-                
-                Provide a concise, actionable recommendation (max 3 sentences) on how to improve the business or maintain success. Focus on the relationship between ratings, sales, and cuisine fit for the location.
-                """
-
-                model = genai.GenerativeModel("models/gemini-flash-latest")
-                gemini_response = await model.generate_content_async(prompt_text)
-                results["gemini_recommendation"] = gemini_response.text.strip()
-            else:
-                results["gemini_recommendation"] = (
-                    "API Key missing. AI analysis skipped."
-                )
-
-        except Exception as g_ex:
-            print(f"[-] Gemini API Error: {g_ex}")
-            results["gemini_recommendation"] = (
-                "AI analysis failed due to an internal error."
+async def gemini_recommendation(features, results) -> str:
+    """The full recommendation text; failures become a user-facing message."""
+    if "GEMINI_API_KEY" not in os.environ:
+        return GEMINI_KEY_MISSING
+    try:
+        return await gemini.generate(gemini_prompt(features, results), features.dict())
+    except Exception as g_ex:
+        return gemini_error(g_ex)
+
+
+async def gemini_stream(features, results):
+    """Yield the recommendation as Gemini produces it."""
+    if "GEMINI_API_KEY" not in os.environ:
+        yield GEMINI_KEY_MISSING
+        return
+    try:
+        async for text in gemini.stream(
+            gemini_prompt(features, results), features.dict()
+        ):
+            yield text
+    except Exception as g_ex:
+        yield gemini_error(g_ex)
+
+
+# --- Deferred Recommendations ---
+# /predict/unified?defer_gemini=true answers with the model results and a
+# job id; the recommendation is fetched later from
+# /predict/unified/recommendation/{job_id} while jobs are kept.
+gemini_jobs = TTLCache(
+    maxsize=int(os.environ.get("GEMINI_JOB_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("GEMINI_JOB_TTL", "600")),
+)
+gemini_tasks = set()
+
+
+def start_gemini_job(features, results) -> str:
+    job_id = uuid.uuid4().hex
+    task = asyncio.ensure_future(gemini_recommendation(features, results))
+    # The event loop only keeps weak references to tasks.
+    gemini_tasks.add(task)
+    task.add_done_callback(gemini_tasks.discard)
+    gemini_jobs.put(job_id, task)
+    return job_id
+
+
+@app.post("/predict/unified")
+async def predict_unified(
+    features: UnifiedFeatures,
+    request: Request,
+    defer_gemini: bool = False,
+    matrix_format: MatrixFormat = "nested",
+):
+    """
+    Runs all models + Gemini Analysis.
+    Per-stage wall times (ms) are returned in the Server-Timing header.
+    With defer_gemini=true the recommendation is replaced by a job id.
+    """
+    timings = {}
+    started = time.perf_counter()
+    job_id = gemini_task = None
+
+    def start_gemini(stage_results):
+        # The prompt only needs steps 1-5, so Gemini runs alongside the matrix.
+        nonlocal job_id, gemini_task
+        if defer_gemini:
+            job_id = start_gemini_job(features, stage_results)
+            gemini_task = gemini_jobs.get(job_id)
+        else:
+            gemini_task = asyncio.ensure_future(
+                timed(timings, "gemini", gemini_recommendation(features, stage_results))
             )
 
-        return results
+    try:
+        results = await unified_predictions(
+            features, timings, matrix_format, start_gemini
+        )
+        if defer_gemini:
+            results["gemini_job_id"] = job_id
+        else:
+            results["gemini_recommendation"] = await gemini_task
+    except BaseException:
+        if gemini_task is not None:
+            gemini_task.cancel()
+        raise
+
+    timings["total"] = (time.perf_counter() - started) * 1000
+    if UNIFIED_LOG_TIMINGS:
+        print(f"[*] Unified timings: {server_timing(timings)}")
+    return negotiated_response(
+        request, results, headers={"Server-Timing": server_timing(timings)}
+    )
+
+
+@app.get("/predict/unified/recommendation/{job_id}")
+async def unified_recommendation(job_id: str, wait: float = 0.0):
+    """
+    Result of a deferred Gemini job. `wait` long-polls for up to that many
+    seconds (capped at 30) before answering "pending".
+    """
+    task = gemini_jobs.get(job_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id.")
+    if not task.done() and wait > 0:
+        await asyncio.wait({task}, timeout=min(wait, 30.0))
+    if not task.done():
+        return {"job_id": job_id, "status": "pending"}
+    return {
+        "job_id": job_id,
+        "status": "done",
+        "gemini_recommendation": task.result(),
+    }
+
+
+def stream_event(event, data, sse) -> str:
+    if sse:
+        return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+    return dumps({"event": event, "data": data}).decode() + "\n"
+
+
+@app.post("/predict/unified/stream")
+async def predict_unified_stream(
+    features: UnifiedFeatures,
+    request: Request,
+    matrix_format: MatrixFormat = "nested",
+):
+    """
+    Streams the unified result: a "predictions" event as soon as the models
+    finish, "gemini" events with recommendation text as it arrives, then
+    "done" with the full recommendation. NDJSON by default, Server-Sent
+    Events when the client accepts text/event-stream.
+    """
+    timings = {}
+    results = await unified_predictions(features, timings, matrix_format)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    async def events():
+        yield stream_event("predictions", results, sse)
+        parts = []
+        async for text in gemini_stream(features, results):
+            parts.append(text)
+            yield stream_event("gemini", text, sse)
+        yield stream_event(
+            "done", {"gemini_recommendation": "".join(parts).strip()}, sse
+        )
 
-    except ValueError as e:
-        raise HTTPException(status_code=422, detail=f"Bad Payload: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unified Error: {str(e)}")
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Server-Timing": server_timing(timings)},
+    )
 
 
 if __name__ == "__main__":
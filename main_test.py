@@ -1,3 +1,5 @@
+import io
+import itertools
 import os
 import warnings
 
@@ -5,7 +7,9 @@ import warnings
 import numpy as np
 import pandas as pd
 from contextlib import asynccontextmanager
+from typing import Dict, List, Literal, Optional, Union
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
 from pydantic import BaseModel
 
 # --- ENV/Warning Mute ---
@@ -121,6 +125,11 @@ async def health_check():
     return {"status": "online", "models_loaded": ["MOCK_MODE"]}
 
 
+@app.get("/ready")
+async def readiness_check():
+    return {"ready": True, "loading": "mock", "models": {}}
+
+
 @app.post("/predict/feedback")
 async def predict_feedback(features: RestaurantFeatures):
     return {"feedback_prediction": "median feedback"}
@@ -176,6 +185,64 @@ async def predict_rf_month_recommend(features: MonthRecommendFeatures):
     }
 
 
+# --- Batch Endpoints (Mocked) ---
+
+
+async def mock_batch(batch, handler):
+    """Repeat the single-row mock response once per batch row."""
+    if isinstance(batch, dict):
+        count = len(next(iter(batch.values()), []))
+    else:
+        count = len(batch)
+    row = await handler(None)
+    return {"count": count, "predictions": [row] * count}
+
+
+@app.post("/predict/feedback/batch")
+async def predict_feedback_batch(
+    batch: Union[List[RestaurantFeatures], Dict[str, list]],
+):
+    return await mock_batch(batch, predict_feedback)
+
+
+@app.post("/predict/sales/batch")
+async def predict_sales_batch(batch: Union[List[SalesFeatures], Dict[str, list]]):
+    return await mock_batch(batch, predict_sales)
+
+
+@app.post("/predict/rf_rating/batch")
+async def predict_rf_rating_batch(batch: Union[List[RatingFeatures], Dict[str, list]]):
+    return await mock_batch(batch, predict_rf_rating)
+
+
+@app.post("/predict/rf_monthly_sales/batch")
+async def predict_rf_monthly_sales_batch(
+    batch: Union[List[SalesPredictFeatures], Dict[str, list]],
+):
+    return await mock_batch(batch, predict_rf_monthly_sales)
+
+
+@app.post("/predict/rf_city_recommend/batch")
+async def predict_rf_city_recommend_batch(
+    batch: Union[List[CityRecommendFeatures], Dict[str, list]],
+):
+    return await mock_batch(batch, predict_rf_city_recommend)
+
+
+@app.post("/predict/rf_success_prob/batch")
+async def predict_rf_success_prob_batch(
+    batch: Union[List[SuccessFeatures], Dict[str, list]],
+):
+    return await mock_batch(batch, predict_rf_success_prob)
+
+
+@app.post("/predict/rf_month_recommend/batch")
+async def predict_rf_month_recommend_batch(
+    batch: Union[List[MonthRecommendFeatures], Dict[str, list]],
+):
+    return await mock_batch(batch, predict_rf_month_recommend)
+
+
 @app.post("/predict/market_matrix")
 async def predict_market_matrix(features: MatrixFeatures):
     """
@@ -789,6 +856,71 @@ async def predict_market_matrix(features: MatrixFeatures):
     }
 
 
+# --- Scenario Sweep (Mocked) ---
+
+
+class SweepRequest(BaseModel):
+    City: Optional[List[str]] = None
+    Cuisine: Optional[List[str]] = None
+    year: List[int] = [2024]
+    month: List[int] = list(range(1, 13))
+    sales_qty: List[float]
+    sales_amount: List[float]
+    Ratings: List[float]
+
+
+MOCK_CITIES = ["Ahmedabad", "Allahabad", "Amritsar", "Bangalore", "Delhi NCR"]
+MOCK_CUISINES = ["Chinese", "Italian", "North Indian"]
+
+
+@app.post("/predict/sweep")
+async def predict_sweep(
+    request: SweepRequest, output_format: Literal["csv", "parquet"] = "csv"
+):
+    """
+    Mocked sweep: the real grid and columns (City varies fastest), with
+    constant predictions.
+    """
+    axes = {
+        "Cuisine": request.Cuisine or MOCK_CUISINES,
+        "year": request.year,
+        "sales_qty": request.sales_qty,
+        "sales_amount": request.sales_amount,
+        "Ratings": request.Ratings,
+        "month": request.month,
+        "City": request.City or MOCK_CITIES,
+    }
+    rows = pd.DataFrame(list(itertools.product(*axes.values())), columns=list(axes))
+    rows = rows[
+        ["City", "Cuisine", "year", "month", "sales_qty", "sales_amount", "Ratings"]
+    ]
+    rows["rf_rating_prediction"] = 4.07
+    rows["rf_sales_prediction"] = 24064.48
+    rows["success_probability_percentage"] = 97.67
+    rows["city_probability_percent"] = 4.67
+    rows["month_probability_percent"] = 15.33
+
+    if output_format == "parquet":
+        try:
+            buffer = io.BytesIO()
+            rows.to_parquet(buffer, index=False)
+        except ImportError:
+            raise HTTPException(
+                status_code=422, detail="Invalid sweep: Parquet output requires pyarrow"
+            )
+        content, media_type = buffer.getvalue(), "application/vnd.apache.parquet"
+    else:
+        content, media_type = rows.to_csv(index=False), "text/csv"
+    return Response(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="sweep.{output_format}"',
+            "X-Sweep-Rows": str(len(rows)),
+        },
+    )
+
+
 @app.post("/predict/unified")
 async def predict_unified(features: UnifiedFeatures):
     """
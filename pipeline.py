@@ -0,0 +1,227 @@
+"""
+The prediction models as one dependency graph, shared by the API (main.py)
+and the dashboard (ui_app5.py).
+Each Stage declares the frame columns ({column: 1-D array}) it reads and
+the columns it adds; a stage depends on the stages that produce its
+inputs. Pipeline.run executes the graph level by level: stages of one
+level are independent and may run in parallel, levels run in order.
+
+The API scores every model on the Ratings it is sent. The dashboard
+predicts the rating first and feeds it to the other forests, which is the
+same graph plus the PREDICTED_RATING stage (chain_rating=True).
+"""
+
+import asyncio
+import functools
+
+# Column order each estimator was fitted with.
+ANN_COLUMNS = ["Resturant_Name", "Cuisine", "Location", "City"]
+DT_COLUMNS = ["sales_qty", "Ratings"]
+RATING_COLUMNS = [
+    "year",
+    "month",
+    "sales_qty",
+    "sales_amount",
+    "City_encoded",
+    "Cuisine_encoded",
+]
+SALES_COLUMNS = [
+    "year",
+    "month",
+    "sales_qty",
+    "Ratings",
+    "City_encoded",
+    "Cuisine_encoded",
+]
+CITY_COLUMNS = [
+    "Cuisine_encoded",
+    "Ratings",
+    "sales_qty",
+    "sales_amount",
+    "year",
+    "month",
+]
+SUCCESS_COLUMNS = [
+    "Ratings",
+    "sales_qty",
+    "sales_amount",
+    "City_encoded",
+    "Cuisine_encoded",
+    "year",
+    "month",
+]
+MONTH_COLUMNS = [
+    "Ratings",
+    "sales_qty",
+    "sales_amount",
+    "City_encoded",
+    "Cuisine_encoded",
+    "year",
+]
+MODEL_COLUMNS = {
+    "DT": DT_COLUMNS,
+    "RATING_RF": RATING_COLUMNS,
+    "SALES_RF": SALES_COLUMNS,
+    "CITY_RF": CITY_COLUMNS,
+    "SUCCESS_RF": SUCCESS_COLUMNS,
+    "MONTH_RF": MONTH_COLUMNS,
+}
+
+# stage -> (model, method, input columns, output column)
+MODEL_STAGES = {
+    "ann": ("ANN", "predict", ANN_COLUMNS, "feedback_proba"),
+    "dt": ("DT", "predict", DT_COLUMNS, "high_sales_prediction"),
+    "rf_rating": ("RATING_RF", "predict", RATING_COLUMNS, "rf_rating_prediction"),
+    "rf_sales": ("SALES_RF", "predict", SALES_COLUMNS, "rf_sales_prediction"),
+    "rf_success": ("SUCCESS_RF", "predict_proba", SUCCESS_COLUMNS, "success_proba"),
+    "rf_city": ("CITY_RF", "predict_proba", CITY_COLUMNS, "city_proba"),
+    "rf_month": ("MONTH_RF", "predict_proba", MONTH_COLUMNS, "month_proba"),
+}
+
+
+class Stage:
+    """One node of a Pipeline: fn(frame) returns {output column: array}."""
+
+    def __init__(self, name, fn, inputs, outputs):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+    def __call__(self, frame):
+        result = self.fn(frame)
+        missing = [c for c in self.outputs if c not in result]
+        if missing:
+            raise ValueError(f"Stage {self.name} did not produce {missing}")
+        return result
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, {list(self.inputs)} -> {list(self.outputs)})"
+
+
+def _rating_as_input(frame):
+    return {"Ratings": frame["rf_rating_prediction"]}
+
+
+PREDICTED_RATING = Stage(
+    "predicted_rating", _rating_as_input, ["rf_rating_prediction"], ["Ratings"]
+)
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+
+        self.producers = {}
+        for stage in stages:
+            for column in stage.outputs:
+                if column in self.producers:
+                    raise ValueError(
+                        f"{column} is produced by both {self.producers[column]} and {stage.name}"
+                    )
+                self.producers[column] = stage.name
+
+        self.dependencies = {
+            stage.name: {self.producers[c] for c in stage.inputs if c in self.producers}
+            for stage in stages
+        }
+        self.levels = self._levels()
+
+    def _levels(self):
+        levels, done = [], set()
+        while len(done) < len(self.stages):
+            level = [
+                name
+                for name, deps in self.dependencies.items()
+                if name not in done and deps <= done
+            ]
+            if not level:
+                raise ValueError("Pipeline stages have a dependency cycle")
+            levels.append(level)
+            done.update(level)
+        return levels
+
+    def __getitem__(self, name):
+        return self.stages[name]
+
+    @property
+    def inputs(self):
+        """Columns the caller's frame has to provide."""
+        return sorted(
+            {c for s in self.stages.values() for c in s.inputs} - set(self.producers)
+        )
+
+    def subset(self, names):
+        """Pipeline of the named stages and everything they depend on."""
+        needed, todo = set(), list(names)
+        while todo:
+            name = todo.pop()
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.dependencies[name])
+        return Pipeline([s for n, s in self.stages.items() if n in needed])
+
+    def _check(self, frame):
+        missing = [c for c in self.inputs if c not in frame]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+
+    def run(self, frame, executor=None):
+        """
+        The frame plus every stage's outputs. With a concurrent.futures
+        executor, the stages of a level run on it concurrently.
+        """
+        self._check(frame)
+        frame = dict(frame)
+        for level in self.levels:
+            stages = [self.stages[name] for name in level]
+            if executor is None or len(stages) == 1:
+                results = [stage(frame) for stage in stages]
+            else:
+                results = list(executor.map(lambda stage: stage(frame), stages))
+            for result in results:
+                frame.update(result)
+        return frame
+
+    async def run_async(self, frame, runner):
+        """
+        run() for the event loop; runner(stage, frame) returns an awaitable of
+        the stage's outputs (e.g. the stage submitted to an executor).
+        """
+        self._check(frame)
+        frame = dict(frame)
+        for level in self.levels:
+            results = await asyncio.gather(
+                *(runner(self.stages[name], frame) for name in level)
+            )
+            for result in results:
+                frame.update(result)
+        return frame
+
+
+def _call_model(call, model, method, output, frame):
+    return {output: call(model, method, frame)}
+
+
+def model_pipeline(call, names=None, chain_rating=False):
+    """
+    Pipeline over MODEL_STAGES (or the `names` subset of it).
+    call(model, method, frame) evaluates one model on a frame, e.g.
+    models[model].predict(model_input(model, frame)); it is how each entry
+    point plugs in its own artifacts and backends.
+    """
+    stages = [
+        Stage(
+            name,
+            functools.partial(_call_model, call, model, method, output),
+            inputs,
+            [output],
+        )
+        for name, (model, method, inputs, output) in MODEL_STAGES.items()
+        if names is None or name in names
+    ]
+    if chain_rating:
+        stages.append(PREDICTED_RATING)
+    return Pipeline(stages)
@@ -0,0 +1,89 @@
+"""
+Response encoding for the large payloads (market matrix, unified, batch).
+JSON is written with the stdlib json module by default. orjson is an
+optional extra that is not in requirements.txt; when it is installed it is
+used instead, and serializes NumPy arrays and scalars natively. Clients
+sending `Accept: application/msgpack` get MessagePack instead (requires the
+msgpack package; JSON otherwise).
+
+NumPy values only reach these encoders when a route returns the Response
+itself. Anything else a route returns goes through FastAPI's
+jsonable_encoder first, which rejects NumPy scalars, so those routes must
+return plain Python values.
+"""
+
+import json
+
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def numpy_default(obj):
+    """Fallback for values the encoders do not handle themselves."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=numpy_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        content,
+        default=numpy_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class NumpyJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with dumps(). It accepts NumPy values only when a
+    route constructs it directly; as the app's default_response_class it
+    just renders what jsonable_encoder already produced.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class MsgpackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, default=numpy_default)
+
+
+def wants_msgpack(request) -> bool:
+    accept = request.headers.get("accept", "")
+    return msgpack is not None and any(t in accept for t in MSGPACK_TYPES)
+
+
+def negotiated_response(request, content, headers=None) -> Response:
+    """
+    Encode `content` as MessagePack or JSON depending on the Accept header.
+    Returning this from an endpoint also skips FastAPI's jsonable_encoder.
+    """
+    response_class = MsgpackResponse if wants_msgpack(request) else NumpyJSONResponse
+    response = response_class(content, headers=headers)
+    response.headers["Vary"] = "Accept"
+    return response
@@ -0,0 +1,304 @@
+"""
+Offline bulk scoring of a CSV / Parquet / XLSX file with every model
+whose input columns are present, using the same artifacts and loaders as
+main.py (ModelRegistry, RF_BACKEND, ANN_BACKEND, ...).
+The input is read in chunks and results are written chunk by chunk, so
+memory stays bounded; --workers N scores chunks in N spawned processes.
+Only the artifacts of the models that run are loaded.
+
+    python score_file.py Classification_model_dataset.xlsx feedback.csv
+    python score_file.py menu.csv scored.csv --models feedback,sales
+    python score_file.py menu.parquet scored.parquet --workers 4
+
+Rows with missing inputs, or a City / Cuisine the encoders do not know,
+get empty outputs for the affected models instead of failing the run.
+"""
+
+import argparse
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import main
+from table_io import infer_format, open_writer, read_chunks
+
+TEXT_COLUMNS = ("Resturant_Name", "Cuisine", "Location", "City")
+TOP_K = 3
+
+
+def score_feedback(frame):
+    probs = main.feedback_model()(frame)
+    return {"feedback_prediction": main.models["FB_CLASSES"][np.argmax(probs, axis=1)]}
+
+
+def score_sales(frame):
+    prediction = main.models["DT"].predict(main.model_input("DT", frame))
+    return {"high_sales_prediction": prediction.astype(np.int64)}
+
+
+def score_rating(frame):
+    X = main.model_input("RATING_RF", frame)
+    return {"rf_rating_prediction": main.models["RATING_RF"].predict(X)}
+
+
+def score_monthly_sales(frame):
+    X = main.model_input("SALES_RF", frame)
+    return {"rf_sales_prediction": main.models["SALES_RF"].predict(X)}
+
+
+def score_success(frame):
+    X = main.model_input("SUCCESS_RF", frame)
+    percent = main.models["SUCCESS_RF"].predict_proba(X)[:, 1] * 100
+    return {
+        "success_probability_percentage": percent.round(2),
+        "is_successful": percent > 50,
+    }
+
+
+def score_city(frame):
+    X = main.model_input("CITY_RF", frame)
+    idx, percent = main.top_k(main.models["CITY_RF"].predict_proba(X), TOP_K)
+    cities = main.category_lookup("LE_CITY").decode(idx)
+    out = {}
+    for rank in range(idx.shape[1]):
+        out[f"top_city_{rank + 1}"] = cities[:, rank]
+        out[f"top_city_{rank + 1}_percent"] = percent[:, rank]
+    return out
+
+
+def score_month(frame):
+    X = main.model_input("MONTH_RF", frame)
+    idx, percent = main.top_k(main.models["MONTH_RF"].predict_proba(X), TOP_K)
+    out = {}
+    for rank in range(idx.shape[1]):
+        out[f"top_month_{rank + 1}"] = idx[:, rank] + 1
+        out[f"top_month_{rank + 1}_percent"] = percent[:, rank]
+    return out
+
+
+# name -> (input schema, scorer, output column dtypes)
+SCORERS = {
+    "feedback": (
+        main.RestaurantFeatures,
+        score_feedback,
+        {"feedback_prediction": object},
+    ),
+    "sales": (main.SalesFeatures, score_sales, {"high_sales_prediction": "Int64"}),
+    "rf_rating": (
+        main.RatingFeatures,
+        score_rating,
+        {"rf_rating_prediction": float},
+    ),
+    "rf_monthly_sales": (
+        main.SalesPredictFeatures,
+        score_monthly_sales,
+        {"rf_sales_prediction": float},
+    ),
+    "rf_success_prob": (
+        main.SuccessFeatures,
+        score_success,
+        {"success_probability_percentage": float, "is_successful": "boolean"},
+    ),
+    "rf_city_recommend": (
+        main.CityRecommendFeatures,
+        score_city,
+        {
+            column: dtype
+            for rank in range(1, TOP_K + 1)
+            for column, dtype in (
+                (f"top_city_{rank}", object),
+                (f"top_city_{rank}_percent", float),
+            )
+        },
+    ),
+    "rf_month_recommend": (
+        main.MonthRecommendFeatures,
+        score_month,
+        {
+            column: dtype
+            for rank in range(1, TOP_K + 1)
+            for column, dtype in (
+                (f"top_month_{rank}", "Int64"),
+                (f"top_month_{rank}_percent", float),
+            )
+        },
+    ),
+}
+
+
+# name -> artifacts the scorer reads; only these are loaded for a run.
+ENCODERS = ("LE_CITY", "LE_CUISINE")
+SCORER_ARTIFACTS = {
+    "feedback": ("X_ENC", "ANN", "FB_CLASSES"),
+    "sales": ("DT", *ENCODERS),
+    "rf_rating": ("RATING_RF", *ENCODERS),
+    "rf_monthly_sales": ("SALES_RF", *ENCODERS),
+    "rf_success_prob": ("SUCCESS_RF", *ENCODERS),
+    "rf_city_recommend": ("CITY_RF", *ENCODERS),
+    "rf_month_recommend": ("MONTH_RF", *ENCODERS),
+}
+
+
+def scorer_artifacts(scorers):
+    """The artifacts `scorers` need, each once, in first-use order."""
+    return list(dict.fromkeys(a for name in scorers for a in SCORER_ARTIFACTS[name]))
+
+
+def input_columns(name):
+    return list(SCORERS[name][0].model_fields)
+
+
+def applicable_scorers(columns, requested=None):
+    """Scorers whose input columns are all present, in SCORERS order."""
+    names = requested or list(SCORERS)
+    return [n for n in names if set(input_columns(n)) <= set(columns)]
+
+
+def chunk_frame(df, encode=True):
+    """
+    {column: array} frame plus a per-column validity mask. Text columns
+    become str, numeric inputs float; with `encode`, City / Cuisine are
+    encoded up front with unknown values marked invalid.
+    """
+    frame, valid = {}, {}
+    for column in df.columns:
+        values = df[column]
+        valid[column] = values.notna().to_numpy()
+        if column in TEXT_COLUMNS:
+            frame[column] = values.astype(str).to_numpy()
+        elif column in ("year", "month", "sales_qty", "sales_amount", "Ratings"):
+            numeric = pd.to_numeric(values, errors="coerce")
+            valid[column] = numeric.notna().to_numpy()
+            frame[column] = numeric.to_numpy(dtype=np.float64)
+
+    for column, encoder in (("City", "LE_CITY"), ("Cuisine", "LE_CUISINE")):
+        if encode and column in frame:
+            codes = main.category_lookup(encoder).known(frame[column])
+            frame[f"{column}_encoded"] = codes
+            valid[f"{column}_encoded"] = valid[column] & (codes >= 0)
+    return frame, valid
+
+
+def empty_column(dtype, n_rows):
+    """n_rows missing values; every chunk gets every column, same dtype."""
+    if dtype in ("Int64", "boolean"):
+        return pd.array([None] * n_rows, dtype=dtype)
+    if dtype is float:
+        return np.full(n_rows, np.nan)
+    return np.full(n_rows, None, dtype=object)
+
+
+def passthrough(values):
+    """An input column as written out; text columns keep blanks as None."""
+    if values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+        # NaN in a str column is not a string to Parquet.
+        return values.to_numpy(dtype=object, na_value=None)
+    return values.to_numpy()
+
+
+def score_chunk(df, scorers):
+    """Input columns plus every scorer's outputs for one DataFrame chunk."""
+    n_rows = len(df)
+    # Only the RFs and the DT read the codes; feedback runs without encoders.
+    frame, valid = chunk_frame(df, encode=any(n != "feedback" for n in scorers))
+    out = {column: passthrough(df[column]) for column in df.columns}
+
+    for name in scorers:
+        _, scorer, outputs = SCORERS[name]
+        for column, dtype in outputs.items():
+            out[column] = empty_column(dtype, n_rows)
+
+        columns = input_columns(name)
+        if name != "feedback":
+            # The RFs need known City / Cuisine codes; the ANN maps unknowns itself.
+            columns = [
+                f"{c}_encoded" if c in ("City", "Cuisine") else c for c in columns
+            ]
+        rows = np.flatnonzero(np.logical_and.reduce([valid[c] for c in columns]))
+        if rows.size == 0:
+            continue
+        sub = {column: values[rows] for column, values in frame.items()}
+        for column, values in scorer(sub).items():
+            out[column][rows] = values
+    return out
+
+
+def init_worker(scorers):
+    if main.load_artifacts(scorer_artifacts(scorers)):
+        raise RuntimeError("Model artifacts failed to load in worker")
+
+
+def scored_chunks(chunks, scorers, workers=1):
+    """score_chunk over `chunks` in order, on up to `workers` processes."""
+    if workers <= 1:
+        for df in chunks:
+            yield score_chunk(df, scorers)
+        return
+
+    # At most 2 chunks per worker are in flight, which bounds memory.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(scorers,),
+    ) as pool:
+        pending = deque()
+        for df in chunks:
+            pending.append(pool.submit(score_chunk, df, scorers))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help=".csv, .parquet or .xlsx")
+    parser.add_argument("output", help=".csv or .parquet")
+    parser.add_argument(
+        "--models",
+        help=f"comma separated subset of: {', '.join(SCORERS)}",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--sheet", help="XLSX sheet name (default: first)")
+    args = parser.parse_args()
+
+    requested = args.models.split(",") if args.models else None
+    unknown = sorted(set(requested or []) - set(SCORERS))
+    if unknown:
+        parser.error(f"unknown models: {', '.join(unknown)}")
+
+    chunks = read_chunks(args.input, args.chunk_rows, sheet=args.sheet)
+    first = next(chunks, None)
+    if first is None:
+        raise SystemExit(f"[-] {args.input} has no rows.")
+    scorers = applicable_scorers(first.columns, requested)
+    if not scorers:
+        raise SystemExit(f"[-] No model has all its input columns in {args.input}.")
+    print(f"[*] Scoring with: {', '.join(scorers)}")
+
+    # With --workers each process loads its own artifacts.
+    if args.workers <= 1 and main.load_artifacts(scorer_artifacts(scorers)):
+        raise SystemExit(1)
+
+    def all_chunks():
+        yield first
+        yield from chunks
+
+    started = time.perf_counter()
+    rows = 0
+    with open(args.output, "wb") as f:
+        writer = open_writer(infer_format(args.output), f)
+        for result in scored_chunks(all_chunks(), scorers, args.workers):
+            writer.write(result)
+            rows += len(next(iter(result.values())))
+            print(f"[*] {rows:,} rows scored...")
+        writer.close()
+    print(
+        f"[+] Wrote {rows:,} rows to {args.output} in {time.perf_counter() - started:.1f}s."
+    )
@@ -0,0 +1,407 @@
+"""
+Serving primitives for the Model-API-Hybrid.
+Keeps CPU-bound inference off the asyncio event loop.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class ExecutorBusy(Exception):
+    """Raised when the inference queue is full and the request is shed."""
+
+
+class InferenceExecutor:
+    """
+    Bounded worker pool for model calls.
+    At most `workers` jobs run at once and `max_queue` more may wait;
+    anything beyond that is rejected immediately with ExecutorBusy.
+    """
+
+    def __init__(self, kind="thread", workers=None, max_queue=64):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._pool = None
+        self._pending = 0
+        self._rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        workers = os.environ.get("INFERENCE_WORKERS")
+        return cls(
+            kind=os.environ.get("INFERENCE_EXECUTOR", "thread"),
+            workers=int(workers) if workers else None,
+            max_queue=int(os.environ.get("INFERENCE_QUEUE_SIZE", "64")),
+        )
+
+    def start(self, initializer=None):
+        """
+        Create the pool. Process workers are spawned (not forked, TF is
+        not fork-safe) and run `initializer` to load their own artifacts.
+        """
+        if self.kind == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="inference"
+            )
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @property
+    def capacity(self):
+        return self.workers + self.max_queue
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool, shedding load when saturated."""
+        if self._pool is None:
+            raise RuntimeError("Inference executor is not started")
+        if self._pending >= self.capacity:
+            self._rejected += 1
+            raise ExecutorBusy(
+                f"Inference queue full ({self._pending}/{self.capacity} pending)"
+            )
+
+        # Only touched from the event loop thread, so no lock is needed.
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool, functools.partial(fn, *args, **kwargs)
+            )
+        finally:
+            self._pending -= 1
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "rejected": self._rejected,
+        }
+
+
+def score_bisect(batch_fn, rows):
+    """
+    batch_fn(rows) as [(result, None), ...]. If the batch raises, its halves
+    are scored on their own, down to single rows, which get (None, error):
+    k bad rows cost O(k log n) extra calls, all in the current worker.
+    """
+    try:
+        return [(result, None) for result in batch_fn(rows)]
+    except Exception as e:
+        if len(rows) == 1:
+            return [(None, e)]
+    middle = len(rows) // 2
+    return score_bisect(batch_fn, rows[:middle]) + score_bisect(batch_fn, rows[middle:])
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row calls for one model into a batched call.
+    Rows are collected until `max_rows` arrive or `window_ms` passes after
+    the first one, then `batch_fn(rows)` runs once on the executor and each
+    caller receives its own row of the result. A failing batch is bisected
+    inside that same job (score_bisect), so one bad row fails alone without
+    taking more executor slots from healthy rows.
+    """
+
+    def __init__(self, batch_fn, executor, window_ms=2.0, max_rows=64):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.window_ms = window_ms
+        self.max_rows = max_rows
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self._batches = 0
+        self._rows = 0
+
+    @property
+    def enabled(self):
+        return self.window_ms > 0 and self.max_rows > 1
+
+    async def submit(self, row):
+        if not self.enabled:
+            return (await self.executor.run(self.batch_fn, [row]))[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        rows = [row for row, _ in batch]
+        try:
+            outcomes = await self.executor.run(score_bisect, self.batch_fn, rows)
+            self._batches += 1
+            self._rows += len(rows)
+        except Exception as e:
+            # ExecutorBusy, or the pool itself failed.
+            outcomes = [(None, e)] * len(batch)
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def stats(self):
+        return {
+            "window_ms": self.window_ms,
+            "max_rows": self.max_rows,
+            "batches": self._batches,
+            "rows": self._rows,
+            "avg_batch_size": (
+                round(self._rows / self._batches, 2) if self._batches else 0.0
+            ),
+        }
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live per entry.
+    ttl=None (or 0) keeps entries until they are evicted by size.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ModelRegistry(dict):
+    """
+    The artifact cache, plus a loader and load status per artifact.
+    `load_all()` loads every registered artifact in parallel. With
+    lazy=True an artifact that is not loaded yet counts as available and is
+    loaded on first lookup instead.
+    """
+
+    def __init__(self, lazy=False):
+        super().__init__()
+        self.lazy = lazy
+        self.loaders = {}
+        self.status = {}
+        self._locks = {}
+
+    def register(self, name, loader):
+        self.loaders[name] = loader
+        self.status[name] = {"state": "pending", "seconds": None, "error": None}
+        self._locks[name] = threading.Lock()
+
+    def load(self, name):
+        with self._locks[name]:
+            if dict.__contains__(self, name):
+                return dict.__getitem__(self, name)
+
+            self.status[name].update(state="loading", error=None)
+            started = time.perf_counter()
+            try:
+                value = self.loaders[name]()
+            except Exception as e:
+                self.status[name].update(
+                    state="failed",
+                    seconds=round(time.perf_counter() - started, 3),
+                    error=f"{type(e).__name__}: {e}",
+                )
+                raise
+
+            dict.__setitem__(self, name, value)
+            self.status[name].update(
+                state="loaded", seconds=round(time.perf_counter() - started, 3)
+            )
+            return value
+
+    def load_all(self, workers=None, names=None):
+        """
+        Load every registered artifact (or just `names`) concurrently;
+        returns the names that failed.
+        """
+        names = [n for n in names or self.loaders if not dict.__contains__(self, n)]
+        if not names:
+            return []
+        with ThreadPoolExecutor(
+            max_workers=workers or len(names), thread_name_prefix="model-load"
+        ) as pool:
+            futures = {name: pool.submit(self.load, name) for name in names}
+        return [name for name, future in futures.items() if future.exception()]
+
+    def __missing__(self, name):
+        if self.lazy and name in self.loaders:
+            return self.load(name)
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        if dict.__contains__(self, name):
+            return True
+        return (
+            self.lazy
+            and name in self.loaders
+            and self.status[name]["state"] != "failed"
+        )
+
+    @property
+    def failed(self):
+        return [n for n, s in self.status.items() if s["state"] == "failed"]
+
+    @property
+    def ready(self):
+        if self.failed:
+            return False
+        return self.lazy or all(dict.__contains__(self, n) for n in self.loaders)
+
+    def clear(self):
+        super().clear()
+        for status in self.status.values():
+            status.update(state="pending", seconds=None, error=None)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency that keeps failing.
+    After `failures` consecutive failures the circuit opens and calls are
+    skipped for `reset_after` seconds; then a single trial call is let
+    through (half-open), which closes the circuit on success or re-opens
+    it on failure. Every allowed call must end in record_success,
+    record_failure or release, or the trial slot stays taken.
+    """
+
+    def __init__(self, failures=5, reset_after=30.0):
+        self.failures = failures
+        self.reset_after = reset_after
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+        self.skipped = 0
+        self.opened = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            self.skipped += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = False
+
+    def release(self):
+        """End a call without an outcome (e.g. cancelled); frees the trial."""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial or self._consecutive >= self.failures:
+                if self._opened_at is None:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive,
+            "failures_to_open": self.failures,
+            "reset_after_seconds": self.reset_after,
+            "opened": self.opened,
+            "skipped": self.skipped,
+        }
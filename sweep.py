@@ -0,0 +1,185 @@
+"""
+Scenario sweep: every City x Cuisine x month (and year) over a grid of
+sales_qty / sales_amount / Ratings values, scored by the five random
+forests. The grid is never materialized: each chunk of rows is decoded
+from a flat row range with np.unravel_index, each model scores only the
+distinct input rows of the chunk, and results are written out chunk by
+chunk as CSV or Parquet (see table_io).
+
+    python sweep.py --cuisines "North Indian,Chinese" --sales-qty 10,20,40 \
+        --ratings 3.5,4.0,4.5 --sales-amount 1500 -o sweep.parquet
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+# City varies fastest, so rows that only differ by city (the City RF's
+# input) sit next to each other.
+GRID_AXES = (
+    "Cuisine",
+    "year",
+    "sales_qty",
+    "sales_amount",
+    "Ratings",
+    "month",
+    "City",
+)
+CATEGORICAL_AXES = ("City", "Cuisine")
+OUTPUT_COLUMNS = (
+    "City",
+    "Cuisine",
+    "year",
+    "month",
+    "sales_qty",
+    "sales_amount",
+    "Ratings",
+)
+DEFAULT_CHUNK_ROWS = 50_000
+# score_frame's output columns and types, for a sweep table with no rows.
+SCORE_DTYPES = {
+    "City": str,
+    "Cuisine": str,
+    "year": np.int64,
+    "month": np.int64,
+    "sales_qty": np.float64,
+    "sales_amount": np.float64,
+    "Ratings": np.float64,
+    "rf_rating_prediction": np.float64,
+    "rf_sales_prediction": np.float64,
+    "success_probability_percentage": np.float64,
+    "city_probability_percent": np.float64,
+    "month_probability_percent": np.float64,
+}
+
+
+class SweepGrid:
+    """
+    Cartesian grid over GRID_AXES. `axes` maps each axis to its values;
+    City and Cuisine are given as (names, codes) pairs so rows carry both
+    the label and the encoded value the models use.
+    """
+
+    def __init__(self, axes):
+        missing = [axis for axis in GRID_AXES if axis not in axes]
+        if missing:
+            raise ValueError(f"Missing sweep axes: {missing}")
+        self.values = {}
+        self.codes = {}
+        for axis in GRID_AXES:
+            if axis in CATEGORICAL_AXES:
+                names, codes = axes[axis]
+                self.values[axis] = np.asarray(names)
+                self.codes[axis] = np.asarray(codes)
+            else:
+                self.values[axis] = np.asarray(axes[axis])
+            if self.values[axis].size == 0:
+                raise ValueError(f"Sweep axis {axis} is empty")
+        self.shape = tuple(self.values[axis].size for axis in GRID_AXES)
+
+    @property
+    def n_rows(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    def frame(self, start, stop):
+        """Rows [start, stop) as {column: 1-D array}, with *_encoded codes."""
+        positions = np.unravel_index(np.arange(start, stop), self.shape)
+        frame = {}
+        for axis, position in zip(GRID_AXES, positions):
+            frame[axis] = self.values[axis][position]
+            if axis in CATEGORICAL_AXES:
+                frame[f"{axis}_encoded"] = self.codes[axis][position]
+        return frame
+
+    def ranges(self, chunk_rows=DEFAULT_CHUNK_ROWS):
+        for start in range(0, self.n_rows, chunk_rows):
+            yield start, min(start + chunk_rows, self.n_rows)
+
+
+def predict_unique(predict, X):
+    """predict(X) evaluated once per distinct row of X."""
+    unique, inverse = np.unique(X, axis=0, return_inverse=True)
+    return predict(unique)[inverse.reshape(-1)]
+
+
+def score_frame(frame, models, model_input):
+    """
+    All five forests for one chunk. `model_input(name, frame)` builds each
+    model's input matrix (main.model_input).
+    """
+
+    def scores(name, predict):
+        return predict_unique(predict, model_input(name, frame))
+
+    city_probs = scores("CITY_RF", models["CITY_RF"].predict_proba)
+    month_probs = scores("MONTH_RF", models["MONTH_RF"].predict_proba)
+    rows = np.arange(len(city_probs))
+
+    out = {column: frame[column] for column in OUTPUT_COLUMNS}
+    out["rf_rating_prediction"] = scores("RATING_RF", models["RATING_RF"].predict)
+    out["rf_sales_prediction"] = scores("SALES_RF", models["SALES_RF"].predict)
+    out["success_probability_percentage"] = np.round(
+        scores("SUCCESS_RF", lambda X: models["SUCCESS_RF"].predict_proba(X)[:, 1])
+        * 100,
+        2,
+    )
+    # Same column conventions as the recommend endpoints: city code and
+    # month - 1 index the probability columns.
+    out["city_probability_percent"] = np.round(
+        city_probs[rows, frame["City_encoded"]] * 100, 2
+    )
+    out["month_probability_percent"] = np.round(
+        month_probs[rows, np.asarray(frame["month"]) - 1] * 100, 2
+    )
+    return out
+
+
+def parse_list(text, cast=str):
+    return [cast(v.strip()) for v in text.split(",") if v.strip()] if text else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-o", "--output", required=True, help=".csv or .parquet")
+    parser.add_argument("--cities", help="comma separated (default: all)")
+    parser.add_argument("--cuisines", help="comma separated (default: all)")
+    parser.add_argument("--years", default="2024")
+    parser.add_argument("--months", default=",".join(map(str, range(1, 13))))
+    parser.add_argument("--sales-qty", default="20")
+    parser.add_argument("--sales-amount", default="1500")
+    parser.add_argument("--ratings", default="3.5,4.0,4.5")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    import main
+    from table_io import write_table
+
+    failed = main.load_artifacts()
+    if failed:
+        raise SystemExit(1)
+
+    request = main.SweepRequest(
+        City=parse_list(args.cities),
+        Cuisine=parse_list(args.cuisines),
+        year=parse_list(args.years, int),
+        month=parse_list(args.months, int),
+        sales_qty=parse_list(args.sales_qty, float),
+        sales_amount=parse_list(args.sales_amount, float),
+        Ratings=parse_list(args.ratings, float),
+    )
+    grid = main.sweep_grid(request)
+    print(f"[*] Sweeping {grid.n_rows:,} scenarios...")
+
+    started = time.perf_counter()
+    rows = write_table(
+        (
+            main.run_sweep_chunk(grid, start, stop)
+            for start, stop in grid.ranges(args.chunk_rows)
+        ),
+        args.output,
+        empty={column: np.array([], dtype) for column, dtype in SCORE_DTYPES.items()},
+    )
+    print(
+        f"[+] Wrote {rows:,} rows to {args.output} in {time.perf_counter() - started:.1f}s."
+    )
@@ -0,0 +1,195 @@
+"""
+Chunked table input and output for sweeps and bulk scoring.
+CSV, Parquet and XLSX files are read as a stream of DataFrame chunks, and
+rows are written one chunk ({column: 1-D array}) at a time as CSV or
+Parquet, either to a file or as a byte stream for an HTTP response, so a
+table never has to fit in memory. Parquet needs pyarrow, XLSX openpyxl.
+"""
+
+import asyncio
+import os
+
+import pandas as pd
+
+# pandas holds the GIL while it formats a block of CSV rows; small blocks let
+# the event loop run while stream_table encodes on a worker thread.
+CSV_BLOCK_ROWS = 2_000
+FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def infer_format(path, default="csv"):
+    """Table format from a file suffix (.csv / .parquet / .pq / .xlsx)."""
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    if suffix in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if suffix == ".csv":
+        return "csv"
+    return default
+
+
+def _read_xlsx(path, chunk_rows, sheet=None):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = [str(c) for c in next(rows, ())]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_rows:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_chunks(path, chunk_rows=50_000, fmt=None, sheet=None):
+    """DataFrames of at most `chunk_rows` rows from a CSV/Parquet/XLSX file."""
+    fmt = fmt or infer_format(path, default=None)
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif fmt == "xlsx":
+        yield from _read_xlsx(path, chunk_rows, sheet)
+    else:
+        raise ValueError(f"Cannot read {path}: unknown table format")
+
+
+class ByteSink:
+    """
+    Write-only file object whose contents are taken out with drain().
+    Keeps counting the position, which pyarrow needs for the footer.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+class CSVChunkWriter:
+    def __init__(self, sink):
+        self.sink = sink
+        self._header = True
+
+    def write(self, chunk):
+        text = pd.DataFrame(chunk).to_csv(
+            index=False, header=self._header, chunksize=CSV_BLOCK_ROWS
+        )
+        self._header = False
+        self.sink.write(text.encode("utf-8"))
+
+    def close(self):
+        pass
+
+
+class ParquetChunkWriter:
+    """One row group per chunk; the schema is taken from the first chunk."""
+
+    def __init__(self, sink):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa, self._pq = pa, pq
+        self.sink = sink
+        self._writer = None
+
+    def write(self, chunk):
+        table = self._pa.table(chunk)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.sink, table.schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self):
+        if self._writer is None:
+            # No chunks: still leave a valid (column-less) Parquet file.
+            self._pq.write_table(self._pa.table({}), self.sink)
+        else:
+            self._writer.close()
+
+
+def check_format(fmt):
+    """Raise ValueError for formats that cannot be written here."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown table format: {fmt}")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet output requires pyarrow") from None
+
+
+def open_writer(fmt, sink):
+    if fmt == "csv":
+        return CSVChunkWriter(sink)
+    if fmt == "parquet":
+        return ParquetChunkWriter(sink)
+    raise ValueError(f"Unknown table format: {fmt}")
+
+
+def write_table(chunks, path, fmt=None, empty=None):
+    """
+    Write an iterable of chunks to `path`; returns the number of rows.
+    `empty` is a zero-row chunk written when there are no rows, so the file
+    still has the columns and their types.
+    """
+    fmt = fmt or infer_format(path)
+    rows = 0
+    with open(path, "wb") as f:
+        writer = open_writer(fmt, f)
+        for chunk in chunks:
+            writer.write(chunk)
+            rows += len(next(iter(chunk.values()), ()))
+        if rows == 0 and empty is not None:
+            writer.write(empty)
+        writer.close()
+    return rows
+
+
+async def stream_table(chunks, fmt):
+    """
+    Async generator of encoded bytes for an async iterable of chunks.
+    Chunks are encoded on a worker thread: a 50k-row CSV chunk takes about
+    a second, which would otherwise stall every request on the event loop.
+    """
+    sink = ByteSink()
+    writer = open_writer(fmt, sink)
+    async for chunk in chunks:
+        await asyncio.to_thread(writer.write, chunk)
+        data = sink.drain()
+        if data:
+            yield data
+    await asyncio.to_thread(writer.close)
+    yield sink.drain()
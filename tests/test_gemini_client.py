@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from gemini_client import GeminiClient, GeminiUnavailable
+from serving import CircuitBreaker
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield FakeResponse(chunk)
+
+
+class FakeModel:
+    """generate_content_async fails, hangs or answers, as set on the class."""
+
+    mode = "ok"
+
+    async def generate_content_async(self, prompt, stream=False):
+        if self.mode == "fail":
+            raise RuntimeError("Gemini is down")
+        if self.mode == "hang":
+            await asyncio.sleep(3600)
+        if stream:
+            return FakeStream(["Open ", "in ", "winter."])
+        return FakeResponse("Open in winter.")
+
+
+@pytest.fixture
+def client():
+    FakeModel.mode = "ok"
+    breaker = CircuitBreaker(failures=1, reset_after=0.05)
+    return GeminiClient(model_factory=FakeModel, timeout=5, breaker=breaker)
+
+
+def open_circuit(client):
+    FakeModel.mode = "fail"
+    with pytest.raises(RuntimeError):
+        asyncio.run(client.generate("prompt", {"case": "fail"}))
+    assert client.breaker.state == "open"
+    with pytest.raises(GeminiUnavailable):
+        asyncio.run(client.generate("prompt", {"case": "skipped"}))
+    time.sleep(0.06)
+    assert client.breaker.state == "half-open"
+
+
+def test_cancelled_trial_frees_the_half_open_slot(client):
+    open_circuit(client)
+    FakeModel.mode = "hang"
+
+    async def cancel_trial():
+        trial = asyncio.create_task(client.generate("prompt", {"case": "trial"}))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(cancel_trial())
+
+    # No verdict on Gemini: still half-open, and the next call is the trial.
+    assert client.breaker.state == "half-open"
+    FakeModel.mode = "ok"
+    assert asyncio.run(client.generate("prompt", {"case": "next"})) == "Open in winter."
+    assert client.breaker.state == "closed"
+
+
+def test_disconnected_stream_frees_the_half_open_slot(client):
+    open_circuit(client)
+    FakeModel.mode = "ok"
+
+    async def read_one_chunk():
+        stream = client.stream("prompt", {"case": "trial"})
+        assert await stream.__anext__() == "Open "
+        await stream.aclose()
+
+    asyncio.run(read_one_chunk())
+
+    assert client.breaker.state == "half-open"
+    assert client.cache.get(client.cache_key({"case": "trial"})) is None
+
+    async def read_all():
+        return [c async for c in client.stream("prompt", {"case": "next"})]
+
+    assert asyncio.run(read_all()) == ["Open ", "in ", "winter."]
+    assert client.breaker.state == "closed"
+
+
+def test_failed_trial_reopens(client):
+    open_circuit(client)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(client.generate("prompt", {"case": "trial"}))
+
+    assert client.breaker.state == "open"
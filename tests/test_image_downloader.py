@@ -0,0 +1,153 @@
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import image_downloader
+from image_downloader import MANIFEST, download_images, read_manifest
+
+# path -> body; /flaky.jpg answers 503 twice first, /down.jpg always 500.
+IMAGES = {
+    "/a.jpg": b"image a",
+    "/b.jpg": b"image b",
+    "/copy-of-a.jpg": b"image a",
+    "/flaky.jpg": b"flaky image",
+}
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = Counter()
+
+    def do_GET(self):
+        self.hits[self.path] += 1
+        if self.path == "/flaky.jpg" and self.hits[self.path] <= 2:
+            self.reply(503, b"", {"Retry-After": "0"})
+        elif self.path == "/down.jpg":
+            self.reply(500, b"")
+        elif self.path in IMAGES:
+            self.reply(200, IMAGES[self.path])
+        else:
+            self.reply(404, b"")
+
+    def reply(self, status, body, headers=()):
+        self.send_response(status)
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class CountingSession(requests.Session):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+
+    def get(self, *args, **kwargs):
+        self.gets += 1
+        return super().get(*args, **kwargs)
+
+
+@pytest.fixture
+def server():
+    StandIn.hits.clear()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(image_downloader, "retry_delay", lambda *args: 0)
+
+
+def jobs(base):
+    paths = ["/a.jpg", "/b.jpg", "/copy-of-a.jpg", "/flaky.jpg", "/missing.jpg"]
+    return [(f"img_{i}.jpg", base + p) for i, p in enumerate(paths)] + [
+        ("img_5.jpg", None)
+    ]
+
+
+def test_download_retry_dedupe_and_failures(server, tmp_path):
+    session = CountingSession()
+    stats = download_images(jobs(server), tmp_path, workers=4, session=session)
+
+    assert stats["downloaded"] == 3
+    assert stats["duplicate"] == 1
+    assert stats["failed"] == 2
+    assert stats["files"] == 3
+    assert sorted(p.name for p in tmp_path.glob("*.jpg")) == [
+        "img_0.jpg",
+        "img_1.jpg",
+        "img_3.jpg",
+    ]
+    assert (tmp_path / "img_3.jpg").read_bytes() == b"flaky image"
+
+    manifest = read_manifest(tmp_path / MANIFEST)
+    assert manifest["img_2.jpg"]["duplicate_of"] == "img_0.jpg"
+    assert manifest["img_3.jpg"]["attempts"] == 3
+    assert manifest["img_4.jpg"]["attempts"] == 1
+    assert manifest["img_4.jpg"]["status"] == "failed"
+    assert manifest["img_5.jpg"]["error"] == "no url"
+    # Two 503s, then the image: the injected session made every request.
+    assert session.gets == 7
+
+
+def test_retries_give_up(server, tmp_path):
+    stats = download_images([("img_0.jpg", server + "/down.jpg")], tmp_path, retries=2)
+
+    assert stats["failed"] == 1
+    assert StandIn.hits["/down.jpg"] == 3
+    assert read_manifest(tmp_path / MANIFEST)["img_0.jpg"]["error"] == "HTTP 500"
+
+
+def test_resume_after_images_were_sorted(server, tmp_path):
+    download_images(jobs(server), tmp_path, workers=4)
+    # What the notebook does after downloading: sort into score folders.
+    (tmp_path / "High Score").mkdir()
+    (tmp_path / "img_0.jpg").rename(tmp_path / "High Score" / "img_0.jpg")
+    (tmp_path / "img_1.jpg").unlink()
+    StandIn.hits.clear()
+
+    stats = download_images(jobs(server), tmp_path, workers=4)
+
+    assert dict(StandIn.hits) == {"/b.jpg": 1}
+    assert stats["downloaded"] == 1
+    assert stats["resumed"] == 2
+    assert stats["duplicate"] == 1
+    assert stats["failed"] == 2
+    assert stats["files"] == 3
+    assert not (tmp_path / "img_0.jpg").exists()
+
+
+def test_retry_failed(server, tmp_path):
+    download_images(jobs(server), tmp_path)
+    StandIn.hits.clear()
+
+    download_images(jobs(server), tmp_path)
+    assert not StandIn.hits
+
+    download_images(jobs(server), tmp_path, retry_failed=True)
+    assert dict(StandIn.hits) == {"/missing.jpg": 1}
+
+
+def test_partial_manifest_line(server, tmp_path):
+    download_images(jobs(server)[:1], tmp_path)
+    with open(tmp_path / MANIFEST, "a") as f:
+        f.write('{"name": "img_')
+
+    download_images(jobs(server)[:2], tmp_path)
+
+    lines = (tmp_path / MANIFEST).read_text().splitlines()
+    assert json.loads(lines[-1])["name"] == "img_1.jpg"
+    assert set(read_manifest(tmp_path / MANIFEST)) == {"img_0.jpg", "img_1.jpg"}
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from serving import InferenceExecutor, MicroBatcher, score_bisect
+
+
+class BatchFn:
+    """Doubles each row; raises for any batch containing a negative row."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, rows):
+        self.calls.append(list(rows))
+        if any(row < 0 for row in rows):
+            raise ValueError(f"bad rows in {rows}")
+        return [2 * row for row in rows]
+
+
+def test_score_bisect_isolates_bad_rows():
+    batch_fn = BatchFn()
+
+    outcomes = score_bisect(batch_fn, [1, 2, -3, 4, 5, 6, 7, 8])
+
+    assert [result for result, _ in outcomes] == [2, 4, None, 8, 10, 12, 14, 16]
+    assert isinstance(outcomes[2][1], ValueError)
+    # 1 batch, then one failing half split down to the bad row: 7 calls, not 9.
+    assert len(batch_fn.calls) == 7
+
+
+def test_failed_batch_takes_no_extra_executor_slots():
+    batch_fn = BatchFn()
+    # Capacity 1: the batch's own job is the only one that can run.
+    executor = InferenceExecutor(kind="thread", workers=1, max_queue=0)
+    executor.start()
+    batcher = MicroBatcher(batch_fn, executor, window_ms=5, max_rows=64)
+
+    async def submit_all():
+        rows = [1, 2, -3] + list(range(4, 40))
+        return await asyncio.gather(
+            *(batcher.submit(row) for row in rows), return_exceptions=True
+        )
+
+    try:
+        results = asyncio.run(submit_all())
+    finally:
+        executor.shutdown()
+
+    assert isinstance(results[2], ValueError)
+    assert results[:2] + results[3:] == [2, 4] + [2 * r for r in range(4, 40)]
+    assert executor.stats()["rejected"] == 0
+    assert batcher.stats()["batches"] == 1
+
+
+@pytest.mark.parametrize("rows", [[-1], [1]])
+def test_single_row(rows):
+    outcome = score_bisect(BatchFn(), rows)[0]
+    assert (outcome[0] is None) == (rows[0] < 0)
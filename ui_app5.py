@@ -1,10 +1,25 @@
 import streamlit as st
+import calendar
+import importlib.util
+import io
+import os
 import pickle
+import requests
+import time
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from features import CategoryLookup, FeatureAssembler
+from pipeline import MODEL_COLUMNS, model_pipeline
+from scipy.interpolate import RegularGridInterpolator
+
+# Models are fed plain NumPy rows (see features.py), not named DataFrames
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
 # ---------------------
 # Init theme state
 # ---------------------
@@ -41,6 +56,24 @@ MODEL_FILES = {
     'enc_cuisine': BASE / 'encoder_cuisine.pkl'
 }
 
+# Predictions and charts are memoized per input; reruns with the same
+# sidebar values (e.g. the theme toggle) skip the models and Plotly.
+UI_CACHE_ENTRIES = int(os.environ.get("UI_CACHE_ENTRIES", "256"))
+
+# Client mode: with DASHBOARD_API_URL set (e.g. http://127.0.0.1:8000) the
+# dashboard scores through the FastAPI service (main.py) and only loads its
+# own models as a fallback when the API cannot be reached.
+DASHBOARD_API_URL = os.environ.get("DASHBOARD_API_URL", "").rstrip("/")
+DASHBOARD_API_TIMEOUT = float(os.environ.get("DASHBOARD_API_TIMEOUT", "10"))
+DASHBOARD_API_POOL = int(os.environ.get("DASHBOARD_API_POOL", "16"))
+# Sweeps come back as Parquet when pyarrow is installed: ~20x smaller than
+# CSV for the what-if surface (29k rows: 114 KB vs 2.6 MB).
+API_SWEEP_FORMAT = "parquet" if importlib.util.find_spec("pyarrow") else "csv"
+
+# What-if sliders are served from a grid of WHATIF_GRID_POINTS values per
+# slider (qty x amount x rating), scored once per city/cuisine/month.
+WHATIF_GRID_POINTS = max(2, int(os.environ.get("WHATIF_GRID_POINTS", "9")))
+
 @st.cache_resource
 def load_pickle(path: Path):
     try:
@@ -49,16 +82,6 @@ def load_pickle(path: Path):
     except Exception:
         return None
 
-def safe_transform(le, value):
-    try:
-        return int(le.transform([value])[0])
-    except Exception:
-        try:
-            return int(le.transform([le.classes_[0]])[0])
-        except Exception:
-            return 0
-
-
 def toggle_theme():
     st.session_state.theme = "light" if st.session_state.theme == "dark" else "dark"
 
@@ -91,14 +114,59 @@ def star_html(rating):
 # ---------------------
 # Load models + encoders
 # ---------------------
-model_ratings = load_pickle(MODEL_FILES['ratings'])
-model_sales = load_pickle(MODEL_FILES['sales'])
-model_city = load_pickle(MODEL_FILES['city'])
-model_success = load_pickle(MODEL_FILES['success'])
-model_month = load_pickle(MODEL_FILES['month'])
 le_city = load_pickle(MODEL_FILES['enc_city'])
 le_cuisine = load_pickle(MODEL_FILES['enc_cuisine'])
 
+# Pipeline model name -> MODEL_FILES key
+LOCAL_MODELS = {
+    'RATING_RF': 'ratings',
+    'SALES_RF': 'sales',
+    'SUCCESS_RF': 'success',
+    'CITY_RF': 'city',
+    'MONTH_RF': 'month',
+}
+
+@st.cache_resource
+def local_models():
+    """
+    The five models with their feature assemblers (column order from each
+    model's feature_names_in_), or None when a model file is missing.
+    """
+    loaded = {}
+    for name, key in LOCAL_MODELS.items():
+        model = load_pickle(MODEL_FILES[key])
+        if model is None:
+            return None
+        loaded[name] = (model, FeatureAssembler.for_model(model, MODEL_COLUMNS[name]))
+    return loaded
+
+def call_local_model(name, method, frame):
+    model, assembler = local_models()[name]
+    return getattr(model, method)(assembler.assemble(frame))
+
+# The shared model graph (pipeline.py), with the predicted rating feeding
+# the sales, success, city and month forests.
+PREDICTION_PIPELINE = model_pipeline(
+    call_local_model,
+    names=['rf_rating', 'rf_sales', 'rf_success', 'rf_city', 'rf_month'],
+    chain_rating=True,
+)
+
+# What-if: the rating is a slider, so every forest takes it as given.
+WHATIF_PIPELINE = model_pipeline(
+    call_local_model,
+    names=['rf_rating', 'rf_sales', 'rf_success', 'rf_city', 'rf_month'],
+)
+
+@st.cache_resource
+def api_session():
+    """One pooled HTTP session shared by every dashboard session."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=DASHBOARD_API_POOL)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 st.set_page_config(page_title='Business Predictor (Neon)', layout='wide', initial_sidebar_state='expanded')
 
 
@@ -148,10 +216,15 @@ st.markdown(theme_css, unsafe_allow_html=True)
 # ---------------------
 # Check models
 # ---------------------
-if any(v is None for v in [model_ratings, model_sales, model_city, model_success, model_month, le_city, le_cuisine]):
+# In client mode only the encoders (for the sidebar) have to be local.
+if le_city is None or le_cuisine is None or (not DASHBOARD_API_URL and local_models() is None):
     st.error("One or more model/encoder files are missing. Place all required .pkl files next to this script.")
     st.stop()
 
+# Dict-based label codes; unknown values fall back to the first class
+city_codes = CategoryLookup.from_encoder(le_city, unknown="first", label="City")
+cuisine_codes = CategoryLookup.from_encoder(le_cuisine, unknown="first", label="Cuisine")
+
 # ---------------------
 # Neon dark CSS tweaks
 # ---------------------
@@ -234,8 +307,8 @@ if not submitted:
 # ---------------------
 # Encode
 # ---------------------
-city_enc = safe_transform(le_city, city)
-cuisine_enc = safe_transform(le_cuisine, cuisine)
+city_enc = city_codes.code(city)
+cuisine_enc = cuisine_codes.code(cuisine)
 
 
 
@@ -379,36 +452,81 @@ This combination gives the strongest early-stage performance in both **sales** a
 # ---------------------
 # Predict
 # ---------------------
-X_rating = pd.DataFrame([{
-    'year': year, 'month': month, 'sales_qty': sales_qty, 'sales_amount': sales_amount,
-    'City_encoded': city_enc, 'Cuisine_encoded': cuisine_enc
-}])
-pred_rating = model_ratings.predict(X_rating)[0]
-
-X_sales = pd.DataFrame([{
-    'year': year, 'month': month, 'sales_qty': sales_qty, 'Ratings': pred_rating,
-    'City_encoded': city_enc, 'Cuisine_encoded': cuisine_enc
-}])
-pred_sales = model_sales.predict(X_sales)[0]
-
-X_success = pd.DataFrame([{
-    'Ratings': pred_rating, 'sales_qty': sales_qty, 'sales_amount': sales_amount,
-    'City_encoded': city_enc, 'Cuisine_encoded': cuisine_enc, 'year': year, 'month': month
-}])
-success_prob = model_success.predict_proba(X_success)[0][1] * 100
-
-X_city = pd.DataFrame([{
-    'Cuisine_encoded': cuisine_enc, 'Ratings': pred_rating, 'sales_qty': sales_qty,
-    'sales_amount': sales_amount, 'year': year, 'month': month
-}])
-city_probs = model_city.predict_proba(X_city)[0]
-city_df = pd.DataFrame({"city": le_city.classes_, "prob": city_probs * 100}).sort_values("prob", ascending=False).reset_index(drop=True)
-
-X_month = pd.DataFrame([{
-    'Ratings': pred_rating, 'sales_qty': sales_qty, 'sales_amount': sales_amount, 'City_encoded': city_enc,
-    'Cuisine_encoded': cuisine_enc, 'year': year
-}])
-month_probs = model_month.predict_proba(X_month)[0] * 100
+@st.cache_data(max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def predict_chain(city_enc, cuisine_enc, year, month, sales_qty, sales_amount):
+    """Rating first, then the models that take the predicted rating."""
+    out = PREDICTION_PIPELINE.run({
+        'year': np.array([year]), 'month': np.array([month]),
+        'sales_qty': np.array([sales_qty]), 'sales_amount': np.array([sales_amount]),
+        'City_encoded': np.array([city_enc]), 'Cuisine_encoded': np.array([cuisine_enc]),
+    })
+    pred_rating = out['rf_rating_prediction'][0]
+    pred_sales = out['rf_sales_prediction'][0]
+    success_prob = out['success_proba'][0][1] * 100
+    city_probs = out['city_proba'][0]
+    city_df = pd.DataFrame({"city": le_city.classes_, "prob": city_probs * 100}).sort_values("prob", ascending=False).reset_index(drop=True)
+    month_probs = out['month_proba'][0] * 100
+    return pred_rating, pred_sales, success_prob, city_df, month_probs
+
+
+def api_sweep(request):
+    """/predict/sweep as a DataFrame, rows in the API's grid order (City fastest)."""
+    response = api_session().post(
+        f"{DASHBOARD_API_URL}/predict/sweep", json=request,
+        params={"output_format": API_SWEEP_FORMAT}, timeout=DASHBOARD_API_TIMEOUT,
+    )
+    response.raise_for_status()
+    if API_SWEEP_FORMAT == "parquet":
+        return pd.read_parquet(io.BytesIO(response.content))
+    return pd.read_csv(io.StringIO(response.text))
+
+
+def api_sweeps(*bodies):
+    """Several /predict/sweep calls at once over the pooled session."""
+    with ThreadPoolExecutor(max_workers=len(bodies)) as pool:
+        return list(pool.map(api_sweep, bodies))
+
+
+@st.cache_data(max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def api_predict_chain(city, cuisine, year, month, sales_qty, sales_amount):
+    """
+    predict_chain through the API: /predict/rf_rating, then two sweeps at
+    the predicted rating holding only the rows the page shows: every city
+    at `month` (selected row + city probabilities) and every month for
+    `city` (month probabilities).
+    """
+    response = api_session().post(
+        f"{DASHBOARD_API_URL}/predict/rf_rating",
+        json={"year": year, "month": month, "sales_qty": sales_qty,
+              "sales_amount": sales_amount, "City": city, "Cuisine": cuisine},
+        timeout=DASHBOARD_API_TIMEOUT,
+    )
+    response.raise_for_status()
+    pred_rating = response.json()["rf_rating_prediction"]
+
+    scenario = {"Cuisine": [cuisine], "year": [year], "sales_qty": [sales_qty],
+                "sales_amount": [sales_amount], "Ratings": [pred_rating]}
+    by_city, by_month = api_sweeps({**scenario, "month": [month]},
+                                   {**scenario, "City": [city], "month": list(range(1, 13))})
+
+    selected = by_city[by_city["City"] == city].iloc[0]
+    city_df = pd.DataFrame({"city": by_city["City"].to_numpy(), "prob": by_city["city_probability_percent"].to_numpy()}).sort_values("prob", ascending=False).reset_index(drop=True)
+    month_probs = by_month.sort_values("month")["month_probability_percent"].to_numpy()
+    return pred_rating, selected["rf_sales_prediction"], selected["success_probability_percentage"], city_df, month_probs
+
+
+prediction = None
+if DASHBOARD_API_URL:
+    try:
+        prediction = api_predict_chain(city, cuisine, year, month, sales_qty, sales_amount)
+    except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+        if local_models() is None:
+            st.error(f"The prediction API is unavailable and no local models are installed. ({e})")
+            st.stop()
+        st.warning(f"The prediction API is unavailable, using local models. ({type(e).__name__})")
+if prediction is None:
+    prediction = predict_chain(city_enc, cuisine_enc, year, month, sales_qty, sales_amount)
+pred_rating, pred_sales, success_prob, city_df, month_probs = prediction
 
 
 
@@ -493,54 +611,66 @@ st.markdown("</div>", unsafe_allow_html=True)
 # ---------------------
 # Neon Gauge (plotly)
 # ---------------------
-gauge = go.Figure(go.Indicator(
-    mode="gauge+number",
-    value=success_prob,
-    number={'suffix':"%", 'font': {'color': '#e6f7ff', 'size': 20}},
-    gauge={
-        'axis': {'range':[0,100], 'tickcolor': '#cbefff'},
-        'bar': {'color': '#00ffd4', 'thickness': 0.25},
-        'bgcolor': "rgba(0,0,0,0)",
-        'steps': [
-            {'range':[0,40], 'color':'#ff4d4d'},
-            {'range':[40,70], 'color':'#ffd11a'},
-            {'range':[70,100], 'color':'#33ff99'}
-        ],
-        'threshold': {'line': {'color': "#ffffff"}, 'thickness': 0.8, 'value': success_prob}
-    }
-))
-gauge.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=300, margin=dict(t=10,b=10,l=10,r=10))
+@st.cache_data(max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def gauge_chart(success_prob):
+    gauge = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=success_prob,
+        number={'suffix':"%", 'font': {'color': '#e6f7ff', 'size': 20}},
+        gauge={
+            'axis': {'range':[0,100], 'tickcolor': '#cbefff'},
+            'bar': {'color': '#00ffd4', 'thickness': 0.25},
+            'bgcolor': "rgba(0,0,0,0)",
+            'steps': [
+                {'range':[0,40], 'color':'#ff4d4d'},
+                {'range':[40,70], 'color':'#ffd11a'},
+                {'range':[70,100], 'color':'#33ff99'}
+            ],
+            'threshold': {'line': {'color': "#ffffff"}, 'thickness': 0.8, 'value': success_prob}
+        }
+    ))
+    gauge.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=300, margin=dict(t=10,b=10,l=10,r=10))
+    return gauge
 
 # ---------------------
 # Charts: City recommendations (neon bar) + Month probs (area + bar)
 # ---------------------
-chart_col1, chart_col2 = st.columns([1,1])
+@st.cache_data(max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def city_chart(city_df, top_n=6):
+    # City neon bar (top 6)
+    city_plot_df = city_df.head(top_n).copy()
+    # color scale neon-ish
+    colors = ['#00ffd4','#7c4dff','#ff0099','#00b3ff','#7affb2','#ff8a00'][:len(city_plot_df)]
+    fig_city = px.bar(city_plot_df, x='city', y='prob', text='prob', template='plotly_dark',
+                      color='city', color_discrete_sequence=colors)
+    fig_city.update_traces(texttemplate='%{text:.1f}%', textposition='outside', marker_line_width=0)
+    fig_city.update_layout(showlegend=False, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                           xaxis_tickangle=-20, yaxis=dict(range=[0, max(city_plot_df['prob'].max()*1.15, 10)]),
+                           margin=dict(t=10,b=40,l=10,r=10))
+    # give neon glow effect via axis/ font color
+    fig_city.update_layout(xaxis=dict(tickfont=dict(color='#cdeaf6')), yaxis=dict(tickfont=dict(color='#cdeaf6')))
+    return fig_city
+
+@st.cache_data(max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def month_chart(month_probs):
+    # Month area + bar
+    month_df = pd.DataFrame({'month': list(range(1,13)), 'prob': month_probs})
+    month_df['month_name'] = pd.to_datetime(month_df['month'], format='%m').dt.strftime('%b')
+    fig_month = go.Figure()
+    fig_month.add_trace(go.Scatter(x=month_df['month_name'], y=month_df['prob'],
+                                   mode='lines', fill='tozeroy', line=dict(color='#7c4dff', width=2),
+                                   hoverinfo='x+y', name='prob'))
+    fig_month.add_trace(go.Bar(x=month_df['month_name'], y=month_df['prob'], marker_color='#00ffd4', opacity=0.6, name='prob_bar'))
+    fig_month.update_layout(template='plotly_dark', plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                            yaxis=dict(range=[0, max(20, month_df['prob'].max()*1.25)], tickfont=dict(color='#cdeaf6')),
+                            xaxis=dict(tickfont=dict(color='#cdeaf6')), showlegend=False, margin=dict(t=10,b=30,l=10,r=10))
+    return fig_month
+
+gauge = gauge_chart(success_prob)
+fig_city = city_chart(city_df)
+fig_month = month_chart(month_probs)
 
-# City neon bar (top 6)
-top_n = 6
-city_plot_df = city_df.head(top_n).copy()
-# color scale neon-ish
-colors = ['#00ffd4','#7c4dff','#ff0099','#00b3ff','#7affb2','#ff8a00'][:len(city_plot_df)]
-fig_city = px.bar(city_plot_df, x='city', y='prob', text='prob', template='plotly_dark',
-                  color='city', color_discrete_sequence=colors)
-fig_city.update_traces(texttemplate='%{text:.1f}%', textposition='outside', marker_line_width=0)
-fig_city.update_layout(showlegend=False, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-                       xaxis_tickangle=-20, yaxis=dict(range=[0, max(city_plot_df['prob'].max()*1.15, 10)]),
-                       margin=dict(t=10,b=40,l=10,r=10))
-# give neon glow effect via axis/ font color
-fig_city.update_layout(xaxis=dict(tickfont=dict(color='#cdeaf6')), yaxis=dict(tickfont=dict(color='#cdeaf6')))
-
-# Month area + bar
-month_df = pd.DataFrame({'month': list(range(1,13)), 'prob': month_probs})
-month_df['month_name'] = pd.to_datetime(month_df['month'], format='%m').dt.strftime('%b')
-fig_month = go.Figure()
-fig_month.add_trace(go.Scatter(x=month_df['month_name'], y=month_df['prob'],
-                               mode='lines', fill='tozeroy', line=dict(color='#7c4dff', width=2),
-                               hoverinfo='x+y', name='prob'))
-fig_month.add_trace(go.Bar(x=month_df['month_name'], y=month_df['prob'], marker_color='#00ffd4', opacity=0.6, name='prob_bar'))
-fig_month.update_layout(template='plotly_dark', plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-                        yaxis=dict(range=[0, max(20, month_df['prob'].max()*1.25)], tickfont=dict(color='#cdeaf6')),
-                        xaxis=dict(tickfont=dict(color='#cdeaf6')), showlegend=False, margin=dict(t=10,b=30,l=10,r=10))
+chart_col1, chart_col2 = st.columns([1,1])
 
 with chart_col1:
     st.markdown("### 🏙 Top City Recommendations", unsafe_allow_html=True)
@@ -554,6 +684,140 @@ with chart_col2:
 st.markdown("### 🔮 Success Gauge", unsafe_allow_html=True)
 st.plotly_chart(gauge, use_container_width=True)
 
+# ---------------------
+# What-if sliders (response surface + interpolation)
+# ---------------------
+def whatif_axes(sales_qty, sales_amount):
+    """Slider ranges around the submitted inputs, as grid axes."""
+    return (
+        np.linspace(0.0, max(2.0 * sales_qty, 50.0), WHATIF_GRID_POINTS),
+        np.linspace(0.0, max(2.0 * sales_amount, 1000.0), WHATIF_GRID_POINTS),
+        np.linspace(1.0, 5.0, WHATIF_GRID_POINTS),
+    )
+
+@st.cache_data(max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def local_surface(city_enc, cuisine_enc, year, month, axes):
+    """Every model on the whole slider grid in one vectorized pass."""
+    qty, amount, rating = (a.ravel() for a in np.meshgrid(*axes, indexing='ij'))
+    n_rows = qty.size
+    out = WHATIF_PIPELINE.run({
+        'year': np.full(n_rows, year), 'month': np.full(n_rows, month),
+        'sales_qty': qty, 'sales_amount': amount, 'Ratings': rating,
+        'City_encoded': np.full(n_rows, city_enc), 'Cuisine_encoded': np.full(n_rows, cuisine_enc),
+    })
+    shape = tuple(a.size for a in axes)
+    return {
+        'cities': np.asarray(le_city.classes_),
+        'rating': out['rf_rating_prediction'].reshape(shape),
+        'sales': out['rf_sales_prediction'].reshape(shape),
+        'success': (out['success_proba'][:, 1] * 100).reshape(shape),
+        'city': (out['city_proba'] * 100).reshape(shape + (-1,)),
+        'month': (out['month_proba'] * 100).reshape(shape + (-1,)),
+    }
+
+@st.cache_data(max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def api_surface(city, cuisine, year, month, axes):
+    """local_surface from two API sweeps: every city at `month`, every month for `city`."""
+    grid = {"Cuisine": [cuisine], "year": [year], "sales_qty": axes[0].tolist(),
+            "sales_amount": axes[1].tolist(), "Ratings": axes[2].tolist()}
+    by_city, by_month = api_sweeps({**grid, "month": [month]},
+                                   {**grid, "City": [city], "month": list(range(1, 13))})
+    shape = tuple(a.size for a in axes)
+    selected = by_city[by_city["City"] == city]
+    return {
+        'cities': by_city["City"].to_numpy()[:len(by_city) // int(np.prod(shape))],
+        'rating': selected["rf_rating_prediction"].to_numpy().reshape(shape),
+        'sales': selected["rf_sales_prediction"].to_numpy().reshape(shape),
+        'success': selected["success_probability_percentage"].to_numpy().reshape(shape),
+        'city': by_city["city_probability_percent"].to_numpy().reshape(shape + (-1,)),
+        'month': by_month["month_probability_percent"].to_numpy().reshape(shape + (12,)),
+    }
+
+def whatif_figures():
+    """
+    This session's what-if bar / month figures. Slider moves update their
+    data in place; building a templated Plotly figure costs ~20 ms each.
+    """
+    if "whatif_figures" not in st.session_state:
+        fig_city = go.Figure(go.Bar(
+            marker_color=['#00ffd4','#7c4dff','#ff0099','#00b3ff','#7affb2','#ff8a00'],
+            texttemplate='%{text:.1f}%', textposition='outside', marker_line_width=0,
+        ))
+        fig_city.update_layout(template='plotly_dark', showlegend=False, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                               xaxis_tickangle=-20, margin=dict(t=10,b=40,l=10,r=10),
+                               xaxis=dict(tickfont=dict(color='#cdeaf6')), yaxis=dict(tickfont=dict(color='#cdeaf6')))
+        months = list(calendar.month_abbr)[1:]
+        fig_month = go.Figure()
+        fig_month.add_trace(go.Scatter(x=months, mode='lines', fill='tozeroy', line=dict(color='#7c4dff', width=2),
+                                       hoverinfo='x+y', name='prob'))
+        fig_month.add_trace(go.Bar(x=months, marker_color='#00ffd4', opacity=0.6, name='prob_bar'))
+        fig_month.update_layout(template='plotly_dark', plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                                yaxis=dict(tickfont=dict(color='#cdeaf6')), xaxis=dict(tickfont=dict(color='#cdeaf6')),
+                                showlegend=False, margin=dict(t=10,b=30,l=10,r=10))
+        st.session_state.whatif_figures = (fig_city, fig_month)
+    return st.session_state.whatif_figures
+
+@st.fragment
+def whatif_section(surface, axes, sales_qty, sales_amount, rating_start):
+    """Slider moves rerun only this fragment and read the precomputed surface."""
+    started = time.perf_counter()
+    st.markdown("### 🎛️ What-if")
+    scol1, scol2, scol3 = st.columns(3)
+    # A forest can predict outside the rating axis; the slider and the
+    # interpolators only accept values on the grid.
+    rating_start = float(np.clip(round(rating_start, 1), axes[2][0], axes[2][-1]))
+    qty = scol1.slider("Orders (qty)", 0.0, float(axes[0][-1]), float(sales_qty), key="whatif_qty")
+    amount = scol2.slider("Sales (₹)", 0.0, float(axes[1][-1]), float(sales_amount), key="whatif_amount")
+    rating = scol3.slider("Rating", float(axes[2][0]), float(axes[2][-1]), rating_start, 0.1, key="whatif_rating")
+
+    # Deltas are against the surface at the submitted inputs, so they only
+    # reflect slider moves, not interpolation error.
+    interpolators = {
+        key: RegularGridInterpolator(axes, grid)
+        for key, grid in surface.items() if key != 'cities'
+    }
+    start = [sales_qty, sales_amount, rating_start]
+    base = {key: f([start])[0] for key, f in interpolators.items()}
+    values = {key: f([[qty, amount, rating]])[0] for key, f in interpolators.items()}
+
+    wcol1, wcol2, wcol3 = st.columns(3)
+    wcol1.metric("Model-predicted Rating", f"{values['rating']:.2f} / 5", f"{values['rating'] - base['rating']:+.2f}",
+                 help="The rating forest's prediction from orders and sales; the Rating slider feeds the other models.")
+    wcol2.metric("Expected Monthly Sales", fmt_inr(values['sales']), f"{round(values['sales'] - base['sales']):+,}")
+    wcol3.metric("Success Probability", f"{values['success']:.2f}%", f"{values['success'] - base['success']:+.2f}")
+
+    fig_city, fig_month = whatif_figures()
+    top = np.argsort(values['city'])[::-1][:6]
+    with fig_city.batch_update():
+        fig_city.data[0].x = surface['cities'][top]
+        fig_city.data[0].y = fig_city.data[0].text = values['city'][top]
+        fig_city.layout.yaxis.range = [0, max(values['city'][top[0]] * 1.15, 10)]
+    with fig_month.batch_update():
+        fig_month.data[0].y = fig_month.data[1].y = values['month']
+        fig_month.layout.yaxis.range = [0, max(20, values['month'].max() * 1.25)]
+
+    ccol1, ccol2 = st.columns([1,1])
+    ccol1.plotly_chart(fig_city, use_container_width=True, key="whatif_city")
+    ccol2.plotly_chart(fig_month, use_container_width=True, key="whatif_month")
+    st.caption(f"Interpolated from a {'×'.join(str(a.size) for a in axes)} grid in {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+whatif_grid = whatif_axes(sales_qty, sales_amount)
+surface = None
+if DASHBOARD_API_URL:
+    try:
+        surface = api_surface(city, cuisine, year, month, whatif_grid)
+    except (requests.RequestException, ValueError, KeyError, IndexError):
+        pass
+if surface is None and local_models() is not None:
+    surface = local_surface(city_enc, cuisine_enc, year, month, whatif_grid)
+if surface is not None:
+    # Only a Run gets here (slider moves rerun just the fragment): start the
+    # sliders at the new inputs. A keyed slider keeps its old value whenever
+    # its range is unchanged.
+    for key in ("whatif_qty", "whatif_amount", "whatif_rating"):
+        st.session_state.pop(key, None)
+    whatif_section(surface, whatif_grid, sales_qty, sales_amount, pred_rating)
+
 # ---------------------
 # Table and extra outputs
 # ---------------------